@@ -1,5 +1,6 @@
 import streamlit as st
 from src.utils.dynamic_ppt_generator import generate_dynamic_pptx_from_chat
+from src.data.context_packer import pack_case_studies
 st.set_page_config(layout='wide', initial_sidebar_state='expanded', page_title="StrataGem")
 
 import os
@@ -167,7 +168,7 @@ else:
         # Only fetch case studies if we have new content and haven't fetched them yet
         if attached_text and not st.session_state.case_studies_fetched:
             with st.spinner('Tapping into the infinite wisdom of universe...'):
-                st.session_state.context_prompt = str(get_rich_case_studies(attached_text)).replace("{", "{{").replace("}", "}}")
+                st.session_state.context_prompt = pack_case_studies(get_rich_case_studies(attached_text)).replace("{", "{{").replace("}", "}}")
                 st.session_state.case_studies_fetched = True
                 st.success("Case studies retrieved successfully!")
 
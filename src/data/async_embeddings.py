@@ -0,0 +1,130 @@
+import os
+import asyncio
+import logging
+import random
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from src.data.embedding_cache import EMBEDDING_CACHE_ENABLED, EmbeddingCache, get_embedding_cache, text_hash
+from src.data.embedding_service import build_base_embedding_model, resolve_embedding_model
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Async Client Settings
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))  # requests in flight
+EMBED_REQUEST_BATCH_SIZE = int(os.getenv("EMBED_REQUEST_BATCH_SIZE", "16"))  # texts per request
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+EMBED_RETRY_BACKOFF = float(os.getenv("EMBED_RETRY_BACKOFF", "0.5"))  # seconds, doubled per attempt
+
+
+class AsyncEmbeddingClient(Embeddings):
+    """
+    Embedding client that keeps up to `concurrency` requests in flight.
+
+    Texts are split into requests of at most `max_batch_size`, sent concurrently
+    through the model's native async API, and retried with exponential backoff and
+    jitter. All requests run on one background event loop, so the concurrency limit
+    holds across every thread using the client (e.g. the pipeline's embed workers).
+    The sync `embed_documents` / `embed_query` make it a drop-in for the loader.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        concurrency: int = EMBED_CONCURRENCY,
+        max_batch_size: int = EMBED_REQUEST_BATCH_SIZE,
+        max_retries: int = EMBED_MAX_RETRIES,
+        backoff: float = EMBED_RETRY_BACKOFF,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.concurrency = concurrency
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache
+        self.requests = 0
+        self.retries = 0
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-embeddings", daemon=True)
+        self._thread.start()
+        self._semaphore = asyncio.run_coroutine_threadsafe(self._make_semaphore(), self._loop).result()
+
+    async def _make_semaphore(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(self.concurrency)
+
+    async def _embed_request(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                self.requests += 1
+                try:
+                    return await self.embeddings.aembed_documents(texts)
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        logger.error(f"Embedding request failed after {attempt + 1} attempts: {e}")
+                        raise
+                    error = e
+            # Back off outside the semaphore so other requests can use the slot
+            delay = self.backoff * (2 ** attempt) * (1 + random.random())
+            attempt += 1
+            self.retries += 1
+            logger.warning(f"Embedding request failed ({error}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_hash(text) for text in texts]
+        vectors: Dict[str, List[float]] = self.cache.get_many(self.model_name, keys) if self.cache else {}
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            missing_keys = list(missing)
+            batches = [missing_keys[i:i + self.max_batch_size] for i in range(0, len(missing_keys), self.max_batch_size)]
+            results = await asyncio.gather(*(self._embed_request([missing[k] for k in batch]) for batch in batches))
+            computed = {key: vector for batch, batch_vectors in zip(batches, results) for key, vector in zip(batch, batch_vectors)}
+            if self.cache:
+                self.cache.put_many(self.model_name, computed)
+            vectors.update(computed)
+
+        return [vectors[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._embed(texts), self._loop))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return asyncio.run_coroutine_threadsafe(self._embed(texts), self._loop).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "retries": self.retries, "concurrency": self.concurrency}
+
+
+_clients: Dict[Tuple[str, str], AsyncEmbeddingClient] = {}
+_client_lock = threading.Lock()
+
+
+def get_async_embedding_client(provider: Optional[str] = None, model_name: Optional[str] = None) -> AsyncEmbeddingClient:
+    """
+    Return the process-wide async embedding client for a model, backed by the shared
+    cache. Defaults to the model configured in the environment.
+    """
+    key = resolve_embedding_model(provider, model_name)
+    with _client_lock:
+        if key not in _clients:
+            embeddings, model_name = build_base_embedding_model(*key)
+            cache = get_embedding_cache() if EMBEDDING_CACHE_ENABLED else None
+            _clients[key] = AsyncEmbeddingClient(embeddings, model_name, cache=cache)
+        return _clients[key]
@@ -0,0 +1,189 @@
+import os
+import argparse
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+from psycopg2.extras import RealDictCursor, execute_values
+from dotenv import load_dotenv
+from src.data.db import pooled_connection
+from src.data.embedding_versions import get_active_version
+from src.data.rag import categories_to_text, extract_business_categories, get_embedding_model
+from src.data.vector_indexes import apply_search_settings, describe_index, first_pass_distance, rerank_candidates
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Batch Settings
+BATCH_QUERY_SIZE = int(os.getenv("BATCH_QUERY_SIZE", "100"))  # inputs per embedding request and SQL statement
+BATCH_EXTRACT_WORKERS = int(os.getenv("BATCH_EXTRACT_WORKERS", "4"))  # concurrent category extractions (LLM calls)
+# Each query's nearest candidates are over-fetched by this factor, in place of the
+# per-query widening of the interactive search
+BATCH_CANDIDATE_FACTOR = 4
+
+
+def batch_nearest_sql(table: str, column: str, key_column: str, storage: str, dim: int,
+                      candidates: int, limit: int, max_distance: float) -> str:
+    """
+    One statement searching for many query vectors: a LATERAL join runs the
+    index-friendly nearest-neighbour search (ORDER BY distance LIMIT n) for every row
+    of a VALUES list of (query_index, vector). Quantized storage is searched on the
+    index first and the candidates re-scored exactly, as in nearest_neighbours_sql.
+    The VALUES list is the only parameter (for execute_values).
+    """
+    return f"""
+    WITH queries (query_index, embedding) AS (VALUES %s)
+    SELECT
+        q.query_index,
+        cs.id,
+        cs.title,
+        cs.source_url,
+        cs.summary,
+        cs.industry,
+        cs.company_size,
+        cs.business_model,
+        cs.growth_stage,
+        cs.key_challenges,
+        cs.core_strategies,
+        cs.content_hash,
+        1 - n.distance AS similarity_score
+    FROM queries q
+    CROSS JOIN LATERAL (
+        SELECT c.{key_column}, c.{column} <=> q.embedding AS distance
+        FROM (
+            SELECT {key_column}, {column} FROM {table}
+            ORDER BY {first_pass_distance(column, storage, dim, "q.embedding")}
+            LIMIT {int(candidates)}
+        ) c
+        ORDER BY distance
+        LIMIT {int(limit)}
+    ) n
+    JOIN case_studies cs ON cs.id = n.{key_column}
+    WHERE n.distance < {float(max_distance)}
+    ORDER BY q.query_index, n.distance
+    """
+
+
+def batch_category_similarity_search(
+    categories_list: List[Dict[str, List[str]]],
+    limit: int = 5,
+    similarity_threshold: float = 0.5
+) -> List[List[Dict[str, Any]]]:
+    """
+    category_based_similarity_search for many category sets: the category texts are
+    embedded in one request and searched in one SQL statement. Returns the matches of
+    each set, in input order.
+    """
+    if not categories_list:
+        return []
+    version = get_active_version()
+    embedding_model = get_embedding_model(version)
+    vectors = embedding_model.embed_documents([categories_to_text(categories) for categories in categories_list])
+
+    table = version["category_table"]
+    results: List[List[Dict[str, Any]]] = [[] for _ in categories_list]
+    with pooled_connection() as conn:
+        index = describe_index(conn, table, "categories_embedding")
+        storage = index["storage"] if index else "full"
+        candidates = rerank_candidates(storage, limit) * BATCH_CANDIDATE_FACTOR
+        apply_search_settings(conn, table, "categories_embedding", candidates)
+        query = batch_nearest_sql(table, "categories_embedding", "case_study_id", storage, version["dim"],
+                                  candidates, limit, 1 - similarity_threshold)
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            rows = execute_values(
+                cursor, query, [(i, np.asarray(vector)) for i, vector in enumerate(vectors)],
+                template=f"(%s, %s::vector({version['dim']}))", page_size=len(vectors), fetch=True
+            )
+        # Drop the SET LOCAL search settings with the read-only transaction
+        conn.rollback()
+
+    for row in rows:
+        case_study = dict(row)
+        query_index = case_study.pop("query_index")
+        case_study["similarity_score"] = round(case_study["similarity_score"], 4)
+        results[query_index].append(case_study)
+    return results
+
+
+def batch_get_case_studies(
+    inputs: List[str],
+    limit: int = 5,
+    similarity_threshold: float = 0.5,
+    workers: int = BATCH_EXTRACT_WORKERS
+) -> List[Dict[str, Any]]:
+    """
+    Category-mode retrieval for many business descriptions at once. Categories are
+    extracted concurrently (through the category cache), then all inputs share one
+    embedding request and one search statement. Unlike query_relevant_case_studies,
+    short result lists are not padded from the category filter.
+
+    Returns one {"categories", "case_studies"} dict per input, in input order.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        categories_list = list(executor.map(extract_business_categories, inputs))
+    matches = batch_category_similarity_search(categories_list, limit, similarity_threshold)
+    return [
+        {"categories": categories, "case_studies": case_studies}
+        for categories, case_studies in zip(categories_list, matches)
+    ]
+
+
+def read_batches(lines, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Parse JSONL input records ({"id": ..., "text": ...}) into batches; ids default to the line number."""
+    batch = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if not isinstance(record, dict) or not record.get("text"):
+            raise ValueError(f"Line {line_number}: expected an object with a 'text' field")
+        record.setdefault("id", line_number)
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_batch_file(input_path: str, output_path: Optional[str], limit: int = 5, similarity_threshold: float = 0.5,
+                   batch_size: int = BATCH_QUERY_SIZE, workers: int = BATCH_EXTRACT_WORKERS) -> int:
+    """Retrieve case studies for every record of a JSONL file and write one JSONL line each. Returns the record count."""
+    count = 0
+    start = time.perf_counter()
+    output = open(output_path, "w", encoding="utf-8") if output_path else sys.stdout
+    try:
+        with open(input_path, encoding="utf-8") as file:
+            for batch in read_batches(file, batch_size):
+                results = batch_get_case_studies([record["text"] for record in batch], limit, similarity_threshold, workers)
+                for record, result in zip(batch, results):
+                    output.write(json.dumps({"id": record["id"], **result}, default=str) + "\n")
+                output.flush()
+                count += len(batch)
+                logger.info(f"Retrieved case studies for {count} inputs ({count / (time.perf_counter() - start):.1f}/s)")
+    finally:
+        if output_path:
+            output.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieve case studies for many business descriptions (JSONL in, JSONL out).")
+    parser.add_argument("input", help='JSONL file of {"id": ..., "text": ...} records')
+    parser.add_argument("--output", default=None, help="JSONL results path (default stdout)")
+    parser.add_argument("--limit", type=int, default=5, help="Case studies per input")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Minimum similarity score")
+    parser.add_argument("--batch-size", type=int, default=BATCH_QUERY_SIZE, help="Inputs per embedding request and SQL statement")
+    parser.add_argument("--workers", type=int, default=BATCH_EXTRACT_WORKERS, help="Concurrent category extractions")
+    args = parser.parse_args()
+
+    run_batch_file(args.input, args.output, args.limit, args.threshold, args.batch_size, args.workers)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
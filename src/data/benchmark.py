@@ -0,0 +1,293 @@
+import os
+import argparse
+import hashlib
+import json
+import logging
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.config import REPORTS_DIR
+from src.data.constants import CATEGORIES
+from src.data.db import connect_to_db, emb_size
+from src.data.dedup import DOCUMENT
+from src.data.embedding_versions import is_base_version, list_versions
+from src.data.data_loader import (
+    EmbeddingClassifier,
+    categories_to_text,
+    chunk_text,
+    classify_case_studies,
+    compute_embeddings,
+    format_categories_for_embedding,
+    get_text_splitter,
+    list_case_study_files,
+    parse_case_study,
+    write_case_study,
+)
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_DIR = REPORTS_DIR / "benchmarks"
+# Synthetic files are named with this prefix so their rows can be cleaned up afterwards
+SYNTHETIC_PREFIX = "bench_"
+
+_FILLER = (
+    "company market growth strategy revenue customers operations team product region "
+    "pricing channel competitors margin investment expansion supply partners brand "
+    "analysis performance quarter leadership transformation capability portfolio"
+).split()
+
+
+def generate_corpus(directory: str, count: int, doc_chars: int, seed: int = 0) -> List[str]:
+    """
+    Write `count` synthetic case studies of roughly `doc_chars` characters each.
+
+    Files follow the `Title:` / `Source:` layout read by parse_case_study, and the
+    text mixes CATEGORIES labels into filler sentences so classifiers have signal.
+    """
+    rng = random.Random(seed)
+    labels = [label for options in CATEGORIES.values() for label in options]
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        sentences = []
+        length = 0
+        while length < doc_chars:
+            words = rng.choices(_FILLER, k=rng.randint(8, 20))
+            words.insert(rng.randrange(len(words)), rng.choice(labels))
+            sentence = " ".join(words).capitalize() + "."
+            sentences.append(sentence)
+            length += len(sentence) + 1
+        paragraphs = [" ".join(sentences[j:j + 5]) for j in range(0, len(sentences), 5)]
+        path = os.path.join(directory, f"{SYNTHETIC_PREFIX}{i:06d}.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(f"Title: Synthetic Case Study {i}\n")
+            file.write(f"Source: https://example.com/case-studies/{i}\n\n")
+            file.write("\n\n".join(paragraphs))
+        paths.append(path)
+    return paths
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic stand-in for the embedding server: unit vectors seeded by text hash."""
+
+    def __init__(self, dim: int = emb_size, latency_ms: float = 0.0):
+        self.dim = dim
+        self.latency = latency_ms / 1000.0
+
+    def _embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StageTimer:
+    """Accumulates wall time per named stage."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+
+def run_benchmark(file_paths: List[str], classifier, embedding_model, bulk: bool = False) -> Dict[str, Any]:
+    """Ingest files stage by stage, timing parse, classify, chunk, embed and insert."""
+    timer = StageTimer()
+    text_splitter = get_text_splitter()
+    conn = connect_to_db()
+    chunks_total = 0
+
+    bulk_loader = None
+    if bulk:
+        from src.data.bulk_load import BulkLoader
+        bulk_loader = BulkLoader(conn, rebuild_indexes=False)
+
+    start = time.perf_counter()
+    try:
+        with timer.stage("parse"):
+            case_studies = [parse_case_study(path) for path in file_paths]
+
+        for case_study in case_studies:
+            with timer.stage("chunk"):
+                case_study["chunks"] = chunk_text(case_study["content"], text_splitter)
+            chunks_total += len(case_study["chunks"])
+            with timer.stage("embed"):
+                case_study["chunk_embeddings"] = compute_embeddings(case_study["chunks"], embedding_model)
+
+        with timer.stage("classify"):
+            if isinstance(classifier, EmbeddingClassifier):
+                for case_study in case_studies:
+                    case_study["metadata"] = classifier.classify(case_study)
+            else:
+                classify_case_studies(classifier, case_studies)
+
+        for case_study in case_studies:
+            with timer.stage("embed"):
+                case_study["categories"] = format_categories_for_embedding(case_study["metadata"])
+                case_study["category_embedding"] = embedding_model.embed_query(categories_to_text(case_study["categories"]))
+            with timer.stage("insert"):
+                if bulk_loader is not None:
+                    bulk_loader.add(case_study)
+                else:
+                    write_case_study(conn, case_study)
+
+        if bulk_loader is not None:
+            with timer.stage("insert"):
+                bulk_loader.close()
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    docs = len(file_paths)
+    return {
+        "documents": docs,
+        "chunks": chunks_total,
+        "total_seconds": round(elapsed, 3),
+        "docs_per_sec": round(docs / elapsed, 3) if elapsed > 0 else None,
+        "stages": {
+            name: {
+                "seconds": round(seconds, 3),
+                "docs_per_sec": round(docs / seconds, 3) if seconds > 0 else None,
+            }
+            for name, seconds in timer.seconds.items()
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def _table_exists(cursor, name: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+    return cursor.fetchone()[0]
+
+
+def cleanup_synthetic_rows():
+    """
+    Delete rows ingested from synthetic benchmark files: other embedding versions'
+    vectors first (they reference case_studies), then the base rows, and the files'
+    near-duplicate signatures and ingestion ledger entries.
+    """
+    conn = connect_to_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id FROM case_studies WHERE source_file LIKE %s", (f"{SYNTHETIC_PREFIX}%",))
+        ids = [row[0] for row in cursor.fetchall()]
+        if ids:
+            if _table_exists(cursor, "embedding_versions"):
+                for version in list_versions(conn):
+                    if is_base_version(version):
+                        continue
+                    cursor.execute(f"DELETE FROM {version['category_table']} WHERE case_study_id = ANY(%s)", (ids,))
+                    cursor.execute(f"DELETE FROM {version['chunk_table']} WHERE case_study_id = ANY(%s)", (ids,))
+            cursor.execute("DELETE FROM case_study_category_embeddings WHERE case_study_id = ANY(%s)", (ids,))
+            cursor.execute("DELETE FROM case_study_chunks WHERE case_study_id = ANY(%s)", (ids,))
+            cursor.execute("DELETE FROM case_studies WHERE id = ANY(%s)", (ids,))
+        if _table_exists(cursor, "minhash_signatures"):
+            # Chunk signatures are keyed by content hash, so they are found by case study
+            cursor.execute(
+                "DELETE FROM minhash_signatures WHERE case_study_id = ANY(%s) OR (kind = %s AND key LIKE %s)",
+                (ids, DOCUMENT, f"{SYNTHETIC_PREFIX}%")
+            )
+        if _table_exists(cursor, "ingestion_run_files"):
+            cursor.execute("DELETE FROM ingestion_run_files WHERE source_file LIKE %s", (f"{SYNTHETIC_PREFIX}%",))
+        conn.commit()
+        logger.info(f"Removed {len(ids)} synthetic case studies")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark case study ingestion on a synthetic corpus.")
+    parser.add_argument("--count", type=int, default=100, help="Number of synthetic case studies")
+    parser.add_argument("--doc-chars", type=int, default=8000, help="Approximate characters per case study")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus-dir", default=None, help="Reuse/write the corpus here instead of a temp dir")
+    parser.add_argument("--embeddings", choices=["stub", "service"], default="stub",
+                        help="Hash-based stub vectors or the configured embedding service")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="Simulated latency per stub embedding call")
+    parser.add_argument("--classifier", choices=["embedding", "zero-shot"], default="embedding",
+                        help="Embedding-similarity classifier or the NLI model (CLASSIFIER_BACKEND applies)")
+    parser.add_argument("--bulk", action="store_true", help="Insert with binary COPY")
+    parser.add_argument("--keep-rows", action="store_true", help="Do not delete the synthetic rows afterwards")
+    parser.add_argument("--output", default=None, help="JSON results path (default reports/benchmarks/<timestamp>.json)")
+    args = parser.parse_args()
+
+    if args.embeddings == "stub":
+        embedding_model = HashEmbeddings(latency_ms=args.embed_latency_ms)
+    else:
+        from src.data.embedding_service import get_embedding_service
+        embedding_model = get_embedding_service()
+
+    if args.classifier == "embedding":
+        classifier = EmbeddingClassifier(embedding_model)
+    else:
+        from src.data.classifier_backends import load_zero_shot_classifier
+        classifier = load_zero_shot_classifier()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = args.corpus_dir or tmp_dir
+        file_paths = [p for p in list_case_study_files(corpus_dir) if os.path.basename(p).startswith(SYNTHETIC_PREFIX)] \
+            if args.corpus_dir and os.path.isdir(args.corpus_dir) else []
+        if len(file_paths) < args.count:
+            file_paths = generate_corpus(corpus_dir, args.count, args.doc_chars, args.seed)
+        file_paths = sorted(file_paths)[:args.count]
+
+        cleanup_synthetic_rows()
+        try:
+            result = run_benchmark(file_paths, classifier, embedding_model, bulk=args.bulk)
+        finally:
+            if not args.keep_rows:
+                cleanup_synthetic_rows()
+
+    result["config"] = {
+        key: value for key, value in vars(args).items() if key not in ("output", "corpus_dir")
+    }
+    result["environment"] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    result["timestamp"] = datetime.now().isoformat(timespec="seconds")
+
+    output = args.output or str(BENCHMARK_DIR / f"ingest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(result, file, indent=2)
+    logger.info(f"Benchmark results written to {output}")
+    logger.info(json.dumps({k: result[k] for k in ("documents", "docs_per_sec", "stages", "peak_rss_mb")}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
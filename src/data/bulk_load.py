@@ -0,0 +1,293 @@
+import io
+import json
+import logging
+import struct
+import time
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from src.data.db import drop_vector_indexes
+from src.data.embedding_versions import is_base_version, list_versions
+from src.data.vector_indexes import build_vector_indexes
+
+logger = logging.getLogger(__name__)
+
+# Chunks staged in memory before a COPY flush
+BULK_BATCH_SIZE = 5000
+
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_TRAILER = struct.pack(">h", -1)
+_TEXT_OID = 25
+
+# Column order of the case_studies COPY rows
+_CASE_STUDY_COLUMNS = (
+    "id, title, source_url, summary, industry, company_size, business_model, growth_stage, "
+    "key_challenges, core_strategies, source_file, content, content_hash, raw_metadata"
+)
+
+
+def _encode_int(value: int) -> bytes:
+    return struct.pack(">i", value)
+
+
+def _encode_text(value: Optional[str]) -> Optional[bytes]:
+    return None if value is None else value.encode("utf-8")
+
+
+def _encode_text_array(values: List[str]) -> bytes:
+    """Binary representation of a one-dimensional text[]."""
+    if not values:
+        return struct.pack(">iii", 0, 0, _TEXT_OID)
+    parts = [struct.pack(">iiiii", 1, 0, _TEXT_OID, len(values), 1)]
+    for value in values:
+        encoded = value.encode("utf-8")
+        parts.append(struct.pack(">i", len(encoded)))
+        parts.append(encoded)
+    return b"".join(parts)
+
+
+def _encode_jsonb(value: Any) -> bytes:
+    # jsonb binary format is a version byte followed by the JSON text
+    return b"\x01" + json.dumps(value).encode("utf-8")
+
+
+def _encode_vector(value) -> bytes:
+    """pgvector binary format: int16 dim, int16 unused, then big-endian float4 values."""
+    array = np.asarray(value, dtype=">f4")
+    return struct.pack(">hh", array.shape[0], 0) + array.tobytes()
+
+
+class _CopyBuffer:
+    """Accumulates rows in PostgreSQL binary COPY format."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.buffer.write(_COPY_HEADER)
+        self.rows = 0
+
+    def add_row(self, fields: List[Optional[bytes]]):
+        self.buffer.write(struct.pack(">h", len(fields)))
+        for field in fields:
+            if field is None:
+                self.buffer.write(struct.pack(">i", -1))
+            else:
+                self.buffer.write(struct.pack(">i", len(field)))
+                self.buffer.write(field)
+        self.rows += 1
+
+    def finish(self) -> io.BytesIO:
+        self.buffer.write(_COPY_TRAILER)
+        self.buffer.seek(0)
+        return self.buffer
+
+
+class BulkLoader:
+    """
+    Stage case studies, chunks and category vectors and write them with binary COPY.
+
+    Rows are flushed in one transaction once `batch_size` chunks are staged (and on
+    `close`). Case study ids are reserved from the sequence up front so chunks can
+    reference them without a round trip per document. Case studies that already
+    have an id (changed files) are updated in place, so rows of other embedding
+    versions that reference them stay valid; their chunks and category vectors are
+    replaced.
+
+    With `rebuild_indexes`, a `full_load` or a load into an empty table drops the
+    vector indexes before the first flush and recreates them once loading finishes,
+    so they are built over the full data set. Incremental loads keep the live indexes
+    and update them row by row, so retrieval never runs without them. When a
+    run `ledger` is given, flushed case studies are marked committed in the same
+    transaction; `on_flush` is called with each case study once it is committed.
+    If a flush fails, its whole batch is marked failed in the ledger and dropped.
+    """
+
+    def __init__(self, conn, batch_size: int = BULK_BATCH_SIZE, rebuild_indexes: bool = True, ledger=None,
+                 on_flush: Optional[Callable[[Dict[str, Any]], None]] = None, full_load: bool = False):
+        self.conn = conn
+        self.ledger = ledger
+        self.on_flush = on_flush
+        self.batch_size = batch_size
+        self.rebuild_indexes = rebuild_indexes
+        self.full_load = full_load
+        self._indexes_checked = False
+        self._indexes_dropped = False
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_chunks = 0
+        self.loaded = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(flush_pending=exc_type is None)
+
+    def add(self, case_study: Dict[str, Any]):
+        """Stage a fully processed case study (metadata, chunks and embeddings)."""
+        self._pending.append(case_study)
+        self._pending_chunks += len(case_study["chunks"])
+        if self._pending_chunks >= self.batch_size:
+            self.flush()
+
+    def _reserve_ids(self, cursor, count: int) -> List[int]:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence('case_studies', 'id')) FROM generate_series(1, %s)",
+            (count,)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def _should_drop_indexes(self, cursor) -> bool:
+        """Drop the vector indexes only for a full load or a load into an empty table."""
+        if not self.rebuild_indexes:
+            return False
+        if self.full_load:
+            return True
+        cursor.execute("SELECT NOT EXISTS (SELECT 1 FROM case_studies)")
+        return cursor.fetchone()[0]
+
+    def _trim_version_chunks(self, cursor, replaced: List[Dict[str, Any]]):
+        """
+        Delete other embedding versions' vectors for chunks a changed case study no
+        longer has; vectors of chunks whose text changed are refreshed by reembed.
+        """
+        ids = [case_study["id"] for case_study in replaced]
+        counts = [len(case_study["chunks"]) for case_study in replaced]
+        for version in list_versions(self.conn):
+            if is_base_version(version):
+                continue
+            cursor.execute(f"""
+            DELETE FROM {version["chunk_table"]} v
+            USING unnest(%s::int[], %s::int[]) AS kept (case_study_id, chunk_count)
+            WHERE v.case_study_id = kept.case_study_id AND v.chunk_number >= kept.chunk_count
+            """, (ids, counts))
+
+    def flush(self):
+        """COPY all staged rows and commit them as one transaction."""
+        if not self._pending:
+            return
+        start = time.perf_counter()
+        cursor = self.conn.cursor()
+        changed = [cs for cs in self._pending if cs.get("id") is not None]
+        replaced = [cs["id"] for cs in changed]
+        try:
+            if not self._indexes_checked:
+                if self._should_drop_indexes(cursor):
+                    drop_vector_indexes(cursor)
+                    self._indexes_dropped = True
+                self._indexes_checked = True
+
+            if replaced:
+                cursor.execute("DELETE FROM case_study_category_embeddings WHERE case_study_id = ANY(%s)", (replaced,))
+                cursor.execute("DELETE FROM case_study_chunks WHERE case_study_id = ANY(%s)", (replaced,))
+                self._trim_version_chunks(cursor, changed)
+
+            new_ids = iter(self._reserve_ids(cursor, len(self._pending) - len(replaced)))
+            for case_study in self._pending:
+                if case_study.get("id") is None:
+                    case_study["id"] = next(new_ids)
+
+            studies, updates, chunks, categories = _CopyBuffer(), _CopyBuffer(), _CopyBuffer(), _CopyBuffer()
+            for case_study in self._pending:
+                metadata = case_study["metadata"]
+                (updates if case_study["id"] in replaced else studies).add_row([
+                    _encode_int(case_study["id"]),
+                    _encode_text(case_study["title"]),
+                    _encode_text(case_study["source"]),
+                    _encode_text(metadata.get("summary", "")),
+                    _encode_text(metadata.get("industry", "Unknown")),
+                    _encode_text(metadata.get("company_size", "Unknown")),
+                    _encode_text(metadata.get("business_model", "Unknown")),
+                    _encode_text(metadata.get("growth_stage", "Unknown")),
+                    _encode_text_array(metadata.get("key_challenges", [])),
+                    _encode_text_array(metadata.get("core_strategies", [])),
+                    _encode_text(case_study["source_file"]),
+                    _encode_text(case_study["content"]),
+                    _encode_text(case_study.get("content_hash")),
+                    _encode_jsonb(metadata),
+                ])
+                for i, (chunk, embedding) in enumerate(zip(case_study["chunks"], case_study["chunk_embeddings"])):
+                    chunks.add_row([
+                        _encode_int(case_study["id"]),
+                        _encode_int(i),
+                        _encode_text(chunk.page_content),
+                        _encode_text(chunk.metadata.get("content_hash")),
+                        _encode_vector(embedding),
+                    ])
+                categories.add_row([
+                    _encode_int(case_study["id"]),
+                    _encode_jsonb(case_study["categories"]),
+                    _encode_vector(case_study["category_embedding"]),
+                ])
+
+            cursor.copy_expert(
+                f"COPY case_studies ({_CASE_STUDY_COLUMNS}) FROM STDIN WITH (FORMAT BINARY)",
+                studies.finish()
+            )
+            if replaced:
+                # Changed case studies keep their row (and id): stage them, then update
+                cursor.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS bulk_case_study_updates "
+                    "(LIKE case_studies) ON COMMIT DELETE ROWS"
+                )
+                cursor.copy_expert(
+                    f"COPY bulk_case_study_updates ({_CASE_STUDY_COLUMNS}) FROM STDIN WITH (FORMAT BINARY)",
+                    updates.finish()
+                )
+                assignments = ", ".join(f"{column} = u.{column}" for column in _CASE_STUDY_COLUMNS.split(", ")[1:])
+                cursor.execute(f"""
+                UPDATE case_studies cs SET {assignments}
+                FROM bulk_case_study_updates u
+                WHERE cs.id = u.id
+                """)
+            cursor.copy_expert(
+                "COPY case_study_chunks (case_study_id, chunk_number, content, content_hash, embedding) "
+                "FROM STDIN WITH (FORMAT BINARY)",
+                chunks.finish()
+            )
+            cursor.copy_expert(
+                "COPY case_study_category_embeddings (case_study_id, categories_json, categories_embedding) "
+                "FROM STDIN WITH (FORMAT BINARY)",
+                categories.finish()
+            )
+            if self.ledger is not None:
+                for case_study in self._pending:
+                    self.ledger.mark_committed(self.conn, case_study)
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            # Give up on the whole batch, so later flushes do not retry the failing rows
+            failed = self._pending
+            self._pending = []
+            self._pending_chunks = 0
+            for case_study in failed:
+                # Reserved ids were not written, so forget them before recording the failure
+                if case_study.get("id") not in replaced:
+                    case_study.pop("id", None)
+                if self.ledger is not None:
+                    self.ledger.mark_failed(case_study, e)
+            logger.error(f"Error bulk loading {len(failed)} case studies: {e}")
+            raise
+        finally:
+            cursor.close()
+
+        logger.info(
+            f"Bulk loaded {studies.rows + updates.rows} case studies and {chunks.rows} chunks "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        self.loaded += studies.rows + updates.rows
+        if self.on_flush is not None:
+            for case_study in self._pending:
+                self.on_flush(case_study)
+        self._pending = []
+        self._pending_chunks = 0
+
+    def close(self, flush_pending: bool = True):
+        """Flush remaining rows and rebuild the vector indexes if they were dropped."""
+        try:
+            if flush_pending:
+                self.flush()
+        finally:
+            if self._indexes_dropped:
+                start = time.perf_counter()
+                # Nothing is searching the dropped indexes, so skip the slower concurrent build
+                build_vector_indexes(self.conn, concurrently=False)
+                self._indexes_dropped = False
+                logger.info(f"Rebuilt vector indexes in {time.perf_counter() - start:.2f}s")
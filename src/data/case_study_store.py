@@ -0,0 +1,131 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from src.data.db import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Case study bodies and chunk texts kept in process, shared by all sessions
+BODY_CACHE_SIZE = int(os.getenv("BODY_CACHE_SIZE", "256"))
+CHUNK_CACHE_SIZE = int(os.getenv("CHUNK_CACHE_SIZE", "4096"))
+
+
+class LRUCache:
+    """Small thread-safe least-recently-used map."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._items:
+                    self._items.move_to_end(key)
+                    found[key] = self._items[key]
+        return found
+
+    def put_many(self, items: Dict[Hashable, Any]):
+        with self._lock:
+            for key, value in items.items():
+                self._items[key] = value
+                self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+# Entries are keyed by content hash, so a case study re-ingested in place (same id and
+# chunk numbers, new text) is fetched again instead of served stale. Rows without a
+# hash are always fetched.
+_bodies = LRUCache(BODY_CACHE_SIZE)  # (case_study_id, content_hash) -> content
+_chunks = LRUCache(CHUNK_CACHE_SIZE)  # chunk content_hash -> content
+
+
+def get_case_study_bodies(case_study_keys: List[Tuple[int, Optional[str]]]) -> Dict[int, str]:
+    """Return full contents by id for (case_study_id, content_hash) keys, fetching the uncached ones in one query."""
+    keys = list(dict.fromkeys(case_study_keys))
+    cached = _bodies.get_many(key for key in keys if key[1] is not None)
+    bodies = {key[0]: content for key, content in cached.items()}
+    missing = [key[0] for key in keys if key not in cached]
+    if missing:
+        with pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id, content_hash, content FROM case_studies WHERE id = ANY(%s)", (missing,))
+                rows = cursor.fetchall()
+        _bodies.put_many({(row[0], row[1]): row[2] for row in rows if row[1] is not None})
+        bodies.update({row[0]: row[2] for row in rows})
+    return bodies
+
+
+def get_case_study_chunks(chunk_keys: List[Tuple[int, int, Optional[str]]]) -> Dict[Tuple[int, int], str]:
+    """
+    Return chunk texts by (case_study_id, chunk_number) for (case_study_id,
+    chunk_number, content_hash) keys, fetching the uncached ones in one query.
+    """
+    keys = list(dict.fromkeys(chunk_keys))
+    cached = _chunks.get_many(key[2] for key in keys if key[2] is not None)
+    chunks = {key[:2]: cached[key[2]] for key in keys if key[2] in cached}
+    missing = [key[:2] for key in keys if key[:2] not in chunks]
+    if missing:
+        with pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                SELECT c.case_study_id, c.chunk_number, c.content_hash, c.content
+                FROM case_study_chunks c
+                JOIN unnest(%s::int[], %s::int[]) AS wanted (case_study_id, chunk_number)
+                    USING (case_study_id, chunk_number)
+                """, ([key[0] for key in missing], [key[1] for key in missing]))
+                rows = cursor.fetchall()
+        _chunks.put_many({row[2]: row[3] for row in rows if row[2] is not None})
+        chunks.update({(row[0], row[1]): row[3] for row in rows})
+    return chunks
+
+
+def with_bodies(case_studies: List[Dict[str, Any]], only_without_summary: bool = False) -> List[Dict[str, Any]]:
+    """
+    Return copies of retrieval results with their `content` loaded, in one batched
+    query. With only_without_summary, only results that have neither a summary nor
+    passages (so nothing else to show) are loaded.
+    """
+    def needs_body(case_study: Dict[str, Any]) -> bool:
+        if "content" in case_study:
+            return False
+        return not only_without_summary or not (case_study.get("summary") or case_study.get("passages"))
+
+    wanted = [(case_study["id"], case_study.get("content_hash")) for case_study in case_studies if needs_body(case_study)]
+    if not wanted:
+        return case_studies
+    bodies = get_case_study_bodies(wanted)
+    return [
+        {**case_study, "content": bodies.get(case_study["id"])} if needs_body(case_study) else case_study
+        for case_study in case_studies
+    ]
+
+
+def load_passages(case_studies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fill in the `content` of retrieval results' passages, which searches return as
+    chunk numbers and content hashes only, with one batched query for the chunks not
+    cached.
+    """
+    keys = [
+        (case_study["id"], passage["chunk_number"], passage.get("content_hash"))
+        for case_study in case_studies
+        for passage in case_study.get("passages") or []
+        if "content" not in passage
+    ]
+    if not keys:
+        return case_studies
+    chunks = get_case_study_chunks(keys)
+    for case_study in case_studies:
+        for passage in case_study.get("passages") or []:
+            if "content" not in passage:
+                passage["content"] = chunks.get((case_study["id"], passage["chunk_number"]), "")
+    return case_studies
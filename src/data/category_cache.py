@@ -0,0 +1,143 @@
+import os
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from src.config import INTERIM_DATA_DIR
+from src.data.constants import CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Cache Settings
+CATEGORY_CACHE_ENABLED = os.getenv("CATEGORY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CATEGORY_CACHE_PATH = os.getenv("CATEGORY_CACHE_PATH", str(INTERIM_DATA_DIR / "category_cache.sqlite"))
+CATEGORY_CACHE_MAX_ENTRIES = int(os.getenv("CATEGORY_CACHE_MAX_ENTRIES", "50000"))
+CATEGORY_CACHE_TTL = float(os.getenv("CATEGORY_CACHE_TTL", str(30 * 24 * 3600)))  # seconds
+# Fraction of entries dropped in one go when the cache is full, to avoid evicting on every put
+EVICTION_FRACTION = 0.1
+
+# Changes whenever an option is added, renamed or removed, so stale extractions are never served
+TAXONOMY_VERSION = hashlib.sha256(json.dumps(CATEGORIES, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def input_hash(text: str) -> str:
+    """Hash input text with case and whitespace normalized, so trivially different uploads share an entry."""
+    return hashlib.sha256(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+class CategoryCache:
+    """
+    On-disk store of extracted business categories keyed by (extractor, input hash,
+    taxonomy version), where the extractor names the LLM model that produced them.
+
+    Entries older than `ttl` seconds are ignored and overwritten. When the number of
+    entries exceeds `max_entries`, the least recently used ones are evicted. Shared by
+    every session of the app through one SQLite file in WAL mode.
+    """
+
+    def __init__(self, path: str = CATEGORY_CACHE_PATH, max_entries: int = CATEGORY_CACHE_MAX_ENTRIES,
+                 ttl: float = CATEGORY_CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS categories (
+            extractor TEXT NOT NULL,
+            input_hash TEXT NOT NULL,
+            taxonomy_version TEXT NOT NULL,
+            categories_json TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (extractor, input_hash, taxonomy_version)
+        )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_categories_last_used ON categories(last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM categories").fetchone()[0]
+
+    def get(self, extractor: str, text: str) -> Optional[Dict[str, List[str]]]:
+        """Return the cached categories for the text, or None if missing or expired."""
+        key = (extractor, input_hash(text), TAXONOMY_VERSION)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT categories_json, created_at FROM categories "
+                "WHERE extractor = ? AND input_hash = ? AND taxonomy_version = ?",
+                key,
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE categories SET last_used = ? WHERE extractor = ? AND input_hash = ? AND taxonomy_version = ?",
+                (now, *key),
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, extractor: str, text: str, categories: Dict[str, List[str]]):
+        """Store categories for the text, evicting old entries if over capacity."""
+        key = (extractor, input_hash(text), TAXONOMY_VERSION)
+        now = time.time()
+        with self._lock:
+            # Expired entries are overwritten in place
+            exists = self._conn.execute(
+                "SELECT 1 FROM categories WHERE extractor = ? AND input_hash = ? AND taxonomy_version = ?",
+                key,
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO categories "
+                "(extractor, input_hash, taxonomy_version, categories_json, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, json.dumps(categories), now, now),
+            )
+            if exists is None:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        self._conn.execute("DELETE FROM categories WHERE created_at < ?", (time.time() - self.ttl,))
+        self._count = self._conn.execute("SELECT COUNT(*) FROM categories").fetchone()[0]
+        excess = self._count - int(self.max_entries * (1 - EVICTION_FRACTION))
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM categories WHERE rowid IN (SELECT rowid FROM categories ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self._count -= excess
+            logger.info(f"Evicted {excess} entries from category cache")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[CategoryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_category_cache() -> Optional[CategoryCache]:
+    """Return the process-wide category cache, or None if caching is disabled."""
+    global _cache
+    if not CATEGORY_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = CategoryCache()
+        return _cache
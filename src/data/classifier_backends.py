@@ -0,0 +1,174 @@
+import os
+import argparse
+import logging
+import time
+from typing import Any, Dict, List, Optional
+import torch
+from dotenv import load_dotenv
+from transformers import AutoTokenizer, pipeline
+from src.config import MODELS_DIR, RAW_DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Classifier Settings
+CLASSIFIER_MODEL = os.getenv("CLASSIFIER_MODEL", "facebook/bart-large-mnli")
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "auto")  # 'auto', 'torch', 'quantized' or 'onnx'
+CLASSIFIER_DEVICE = os.getenv("CLASSIFIER_DEVICE")  # e.g. 'cuda', 'cpu'; detected when unset
+CLASSIFIER_THREADS = int(os.getenv("CLASSIFIER_THREADS", "0"))  # 0 keeps the torch default
+
+BACKENDS = ["auto", "torch", "quantized", "onnx"]
+
+
+def detect_device() -> str:
+    """Pick CUDA when available, otherwise CPU."""
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _set_threads(num_threads: int):
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+        logger.info(f"Using {num_threads} CPU threads for classification")
+
+
+def _load_torch(model_name: str, device: str):
+    return pipeline("zero-shot-classification", model=model_name, device=device)
+
+
+def _load_quantized(model_name: str):
+    """fp32 model with every nn.Linear dynamically quantized to int8 (CPU only)."""
+    classifier = pipeline("zero-shot-classification", model=model_name, device="cpu")
+    classifier.model = torch.quantization.quantize_dynamic(
+        classifier.model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    classifier.model.eval()
+    return classifier
+
+
+def _load_onnx(model_name: str, num_threads: int):
+    """ONNX Runtime export of the model with dynamic int8 quantization, cached under models/."""
+    try:
+        from onnxruntime import SessionOptions
+        from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    except ImportError as e:
+        raise ImportError(
+            "The 'onnx' classifier backend requires optimum[onnxruntime]: pip install -e '.[onnx]'"
+        ) from e
+
+    export_dir = MODELS_DIR / f"{model_name.replace('/', '--')}-onnx"
+    quantized_dir = MODELS_DIR / f"{model_name.replace('/', '--')}-onnx-int8"
+    if not quantized_dir.exists():
+        logger.info(f"Exporting {model_name} to ONNX at {export_dir}...")
+        model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+        model.save_pretrained(export_dir)
+        quantizer = ORTQuantizer.from_pretrained(export_dir)
+        quantizer.quantize(
+            save_dir=quantized_dir,
+            quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False),
+        )
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(quantized_dir)
+
+    session_options = SessionOptions()
+    if num_threads > 0:
+        session_options.intra_op_num_threads = num_threads
+    model = ORTModelForSequenceClassification.from_pretrained(
+        quantized_dir, file_name="model_quantized.onnx", session_options=session_options
+    )
+    tokenizer = AutoTokenizer.from_pretrained(quantized_dir)
+    return pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+
+
+def load_zero_shot_classifier(
+    backend: Optional[str] = None,
+    device: Optional[str] = None,
+    num_threads: Optional[int] = None,
+    model_name: str = CLASSIFIER_MODEL,
+):
+    """
+    Load the zero-shot classification pipeline with the requested inference backend.
+
+    Every backend returns a transformers zero-shot pipeline, so callers can use it
+    directly or through its `model`, `tokenizer` and `entailment_id` attributes.
+    'auto' uses fp32 torch on CUDA and the int8 quantized model on CPU.
+    """
+    backend = (backend or CLASSIFIER_BACKEND).lower()
+    device = device or CLASSIFIER_DEVICE or detect_device()
+    num_threads = CLASSIFIER_THREADS if num_threads is None else num_threads
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown classifier backend '{backend}', expected one of {BACKENDS}")
+    if backend == "auto":
+        backend = "torch" if device.startswith("cuda") else "quantized"
+
+    _set_threads(num_threads)
+    logger.info(f"Loading zero-shot classification model ({backend}) on {device if backend == 'torch' else 'cpu'}...")
+
+    if backend == "torch":
+        return _load_torch(model_name, device)
+    if backend == "quantized":
+        return _load_quantized(model_name)
+    return _load_onnx(model_name, num_threads)
+
+
+def _agreement(reference: Any, candidate: Any) -> float:
+    if isinstance(reference, list):
+        union = set(reference) | set(candidate)
+        return len(set(reference) & set(candidate)) / len(union) if union else 1.0
+    return float(reference == candidate)
+
+
+def compare_classifiers(reference, candidate, case_studies: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Measure the accuracy delta of a candidate backend against a reference one.
+
+    Returns per-category agreement (exact match for single-label categories, Jaccard
+    overlap for multi-label ones) and the time each classifier took.
+    """
+    from src.data.data_loader import extract_metadata_batch
+
+    start = time.perf_counter()
+    expected = extract_metadata_batch(reference, case_studies)
+    reference_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = extract_metadata_batch(candidate, case_studies)
+    candidate_seconds = time.perf_counter() - start
+
+    categories = [key for key in expected[0] if key != "summary"] if expected else []
+    agreement = {
+        category: round(sum(_agreement(e[category], a[category]) for e, a in zip(expected, actual)) / len(expected), 4)
+        for category in categories
+    }
+    return {
+        "documents": len(case_studies),
+        "agreement": agreement,
+        "mean_agreement": round(sum(agreement.values()) / len(agreement), 4) if agreement else 1.0,
+        "reference_seconds": round(reference_seconds, 3),
+        "candidate_seconds": round(candidate_seconds, 3),
+        "speedup": round(reference_seconds / candidate_seconds, 2) if candidate_seconds > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a classifier backend against the fp32 torch model.")
+    parser.add_argument("backend", choices=[b for b in BACKENDS if b != "auto"], help="Backend to evaluate")
+    parser.add_argument("--directory", default=str(RAW_DATA_DIR), help="Directory of case study .txt files")
+    parser.add_argument("--sample", type=int, default=50, help="Number of case studies to compare on")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    from src.data.data_loader import list_case_study_files, parse_case_study
+
+    case_studies = [parse_case_study(path) for path in list_case_study_files(args.directory)[:args.sample]]
+    reference = load_zero_shot_classifier("torch", device="cpu", num_threads=args.threads)
+    candidate = load_zero_shot_classifier(args.backend, device="cpu", num_threads=args.threads)
+    result = compare_classifiers(reference, candidate, case_studies)
+    for key, value in result.items():
+        logger.info(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
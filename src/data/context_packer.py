@@ -0,0 +1,160 @@
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from src.data.case_study_store import with_bodies
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Model Settings
+model_provider = os.getenv("MODEL_PROVIDER", "ollama")
+llm_model = os.getenv("LLM_MODEL", "Gemma3")
+# Context Settings
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))  # tokens for all case studies together
+# Hugging Face tokenizer matching a local (ollama) model; without one, tiktoken's
+# cl100k_base is used as an approximation
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "")
+# Every included case study gets at least this many tokens, enough for its title and URL
+MIN_STUDY_TOKENS = 48
+TRUNCATION_MARK = " …"
+
+CATEGORY_FIELDS = ["industry", "company_size", "business_model", "growth_stage", "key_challenges", "core_strategies"]
+
+
+class Tokenizer:
+    """Encode/decode pair for the chat model, so budgets are counted in its tokens."""
+
+    def __init__(self, encode: Callable[[str], List[int]], decode: Callable[[List[int]], str], name: str):
+        self.encode = encode
+        self.decode = decode
+        self.name = name
+
+    def count(self, text: str) -> int:
+        return len(self.encode(text))
+
+
+_tokenizer: Optional[Tokenizer] = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer() -> Tokenizer:
+    """Return the tokenizer of the configured chat model, loading it on first use."""
+    global _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer is not None:
+            return _tokenizer
+        if CONTEXT_TOKENIZER and model_provider.lower() != "openai":
+            from transformers import AutoTokenizer
+            hf_tokenizer = AutoTokenizer.from_pretrained(CONTEXT_TOKENIZER)
+            _tokenizer = Tokenizer(
+                lambda text: hf_tokenizer.encode(text, add_special_tokens=False),
+                lambda tokens: hf_tokenizer.decode(tokens),
+                CONTEXT_TOKENIZER,
+            )
+        else:
+            import tiktoken
+            try:
+                encoding = tiktoken.encoding_for_model(llm_model if model_provider.lower() == "openai" else "")
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+            _tokenizer = Tokenizer(encoding.encode, encoding.decode, encoding.name)
+        logger.info(f"Counting context tokens with {_tokenizer.name}")
+        return _tokenizer
+
+
+def study_score(case_study: Dict[str, Any]) -> float:
+    """Re-ranker score when present, otherwise the retrieval similarity."""
+    score = case_study.get("rerank_score", case_study.get("similarity_score"))
+    return float(score) if score is not None else 0.0
+
+
+def format_values(value) -> str:
+    return ", ".join(value) if isinstance(value, (list, tuple)) else str(value)
+
+
+def render_case_study(rank: int, case_study: Dict[str, Any]) -> str:
+    """
+    Compact text for one case study, most important first (title, URL, profile,
+    summary, passages), so truncating from the end drops the least useful part.
+    The full content is only used when there is neither a summary nor passages
+    (pack_case_studies loads it for those).
+    """
+    lines = [f"[{rank}] {case_study.get('title') or 'Untitled case study'}"]
+    if case_study.get("source_url"):
+        lines.append(f"URL: {case_study['source_url']}")
+    profile = [
+        f"{field.replace('_', ' ')}: {format_values(case_study[field])}"
+        for field in CATEGORY_FIELDS if case_study.get(field)
+    ]
+    if profile:
+        lines.append("Profile: " + "; ".join(profile))
+    if case_study.get("summary"):
+        lines.append(f"Summary: {case_study['summary'].strip()}")
+    passages = sorted(case_study.get("passages") or [], key=lambda p: -p.get("similarity_score", 0.0))
+    if passages:
+        lines.append("Relevant passages:")
+        lines.extend(f"- {' '.join(passage['content'].split())}" for passage in passages)
+    if not case_study.get("summary") and not passages and case_study.get("content"):
+        lines.append(f"Content: {' '.join(case_study['content'].split())}")
+    return "\n".join(lines)
+
+
+def allocate_budget(needs: List[int], weights: List[float], budget: int) -> List[int]:
+    """
+    Split a token budget across studies in proportion to their weights, never giving
+    one more than it needs; what a study leaves unused is shared among the rest.
+    """
+    allocation = [0] * len(needs)
+    open_studies = list(range(len(needs)))
+    remaining = budget
+    while open_studies and remaining > 0:
+        total_weight = sum(weights[i] for i in open_studies)
+        capped = [i for i in open_studies if needs[i] - allocation[i] <= remaining * weights[i] / total_weight]
+        if not capped:
+            # Everyone wants more than their share: hand out the shares and stop
+            shares = [int(remaining * weights[i] / total_weight) for i in open_studies]
+            for i, share in zip(open_studies, shares):
+                allocation[i] += share
+            break
+        for i in capped:
+            remaining -= needs[i] - allocation[i]
+            allocation[i] = needs[i]
+        open_studies = [i for i in open_studies if i not in capped]
+    return allocation
+
+
+def pack_case_studies(case_studies: List[Dict[str, Any]], budget: int = CONTEXT_TOKEN_BUDGET,
+                      tokenizer: Optional[Tokenizer] = None) -> str:
+    """
+    Pack retrieved case studies into prompt text of at most `budget` tokens.
+
+    Studies are ordered by score and the budget split between them by score. A study
+    over its allocation is cut at a token boundary, so the same results always give
+    the same prompt. Studies that cannot get MIN_STUDY_TOKENS are left out.
+    """
+    if not case_studies:
+        return ""
+    tokenizer = tokenizer or get_tokenizer()
+    ranked = sorted(case_studies, key=study_score, reverse=True)
+    max_studies = max(1, budget // MIN_STUDY_TOKENS)
+    ranked = with_bodies(ranked[:max_studies], only_without_summary=True)
+
+    encoded: List[Tuple[List[int], float]] = []
+    for rank, case_study in enumerate(ranked, start=1):
+        encoded.append((tokenizer.encode(render_case_study(rank, case_study) + "\n\n"), study_score(case_study)))
+    # Scores can be negative (cross-encoder logits) or zero (fallback filter matches)
+    lowest = min(score for _, score in encoded)
+    weights = [score - lowest + 1.0 for _, score in encoded]
+    mark_tokens = tokenizer.count(TRUNCATION_MARK) + tokenizer.count("\n\n")
+    allocation = allocate_budget([len(tokens) for tokens, _ in encoded], weights, budget)
+
+    sections = []
+    for (tokens, _), allowed in zip(encoded, allocation):
+        if allowed >= len(tokens):
+            sections.append(tokenizer.decode(tokens).strip())
+        elif allowed >= MIN_STUDY_TOKENS:
+            sections.append(tokenizer.decode(tokens[:allowed - mark_tokens]).rstrip() + TRUNCATION_MARK)
+    return "\n\n".join(sections)
@@ -1,5 +1,6 @@
 import os
 import json
+import hashlib
 import logging
 import re
 import psycopg2
@@ -7,14 +8,23 @@ from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 import argparse
 from tqdm import tqdm
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 import numpy as np
-from transformers import pipeline
+import torch
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema.document import Document
 from src.config import RAW_DATA_DIR
-from src.data.db import connect_to_db
+from src.data.db import get_pool
 from src.data.constants import CATEGORIES
+from src.data.async_embeddings import get_async_embedding_client
+from src.data.bulk_load import BulkLoader
+from src.data.classifier_backends import load_zero_shot_classifier
+from src.data.ingest_ledger import IngestionLedger, PARSED, CLASSIFIED, EMBEDDED
+from src.data.dedup import DEDUP_ENABLED, NearDuplicateDetector, get_canonical_metadata
+from src.data.embedding_versions import get_active_version, is_base_version, write_version_embeddings
+from src.data.embedding_service import resolve_embedding_model
+from src.data.label_embeddings import LabelEmbeddings, get_label_embeddings, normalize_rows
+from src.data.vector_indexes import ensure_vector_indexes
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -30,61 +40,56 @@ embedding_model = os.getenv("EMBEDDING_MODEL", "mxbai-embed-large")  # Default f
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 
+# Number of premise/hypothesis pairs per NLI forward pass and documents per classify batch
+CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", "64"))
+CLASSIFY_DOC_BATCH_SIZE = int(os.getenv("CLASSIFY_DOC_BATCH_SIZE", "8"))
+HYPOTHESIS_TEMPLATE = "This example is {}."
+MULTI_LABEL_CATEGORIES = ['key_challenges', 'core_strategies']
 
-def setup_classifiers(device="cuda"):
-    """Initialize the zero-shot classification model for metadata extraction."""
-    logger.info(f"Loading zero-shot classification model on {device}...")
-    classifier = pipeline(
-        "zero-shot-classification",
-        model="facebook/bart-large-mnli",
-        device=device
-    )
+# 'zero-shot' (NLI model) or 'embedding' (cosine similarity against label embeddings)
+CLASSIFIER_MODE = os.getenv("CLASSIFIER_MODE", "zero-shot")
+# Minimum cosine similarity for a multi-label category option in embedding mode
+EMBEDDING_LABEL_THRESHOLD = float(os.getenv("EMBEDDING_LABEL_THRESHOLD", "0.5"))
+
+
+def setup_classifiers(device: Optional[str] = None, backend: Optional[str] = None, num_threads: Optional[int] = None, mode: Optional[str] = None, version: Optional[Dict[str, Any]] = None):
+    """
+    Initialize the classifier for metadata extraction and the embedding model.
     
-    # Initialize embedding model based on environment settings
-    logger.info(f"Setting up embedding model...")
-    embeddings = None
+    In 'zero-shot' mode `backend` selects fp32 torch, int8 dynamically quantized torch
+    or ONNX Runtime (see src/data/classifier_backends.py); by default the device is
+    detected and CPU-only workers get the quantized model. In 'embedding' mode no NLI
+    model is loaded and documents are classified from their chunk embeddings.
     
-    # too broke for OpenAI rn :)
-    # if model_provider.lower() == "openai":
-    #     from langchain_openai import OpenAIEmbeddings
-        
-    #     embeddings = OpenAIEmbeddings(
-    #         model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
-    #     )
-    # else:  # Default to ollama
-    from langchain_ollama import OllamaEmbeddings
-    
-    embeddings = OllamaEmbeddings(
-        model=embedding_model
-    )
+    `version` (see src/data/embedding_versions.py) selects the embedding model; by
+    default the one configured in the environment is used.
+    """
+    # Shared async client: keeps several embedding requests in flight with retries
+    provider, model = (version["provider"], version["model"]) if version else resolve_embedding_model()
+    embeddings = get_async_embedding_client(provider, model)
+    
+    if (mode or CLASSIFIER_MODE).lower() == "embedding":
+        logger.info("Using embedding-similarity classifier for metadata extraction")
+        return EmbeddingClassifier(embeddings, label_embeddings=get_label_embeddings(embeddings, f"{provider}/{model}")), embeddings
     
+    classifier = load_zero_shot_classifier(backend=backend, device=device, num_threads=num_threads)
     return classifier, embeddings
 
 def get_embedding_model():
-    """Initialize embedding model based on environment settings."""
-    logger.info(f"Setting up embedding model...")
-    embeddings = None
-    
-    if model_provider.lower() == "openai":
-        from langchain_openai import OpenAIEmbeddings
-        
-        embeddings = OpenAIEmbeddings(
-            model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
-        )
-    else:  # Default to ollama
-        from langchain_ollama import OllamaEmbeddings
-        
-        embeddings = OllamaEmbeddings(
-            model=embedding_model
-        )
-    
-    return embeddings
+    """Return the shared async embedding client configured from environment settings."""
+    return get_async_embedding_client()
+
+def compute_content_hash(text: str) -> str:
+    """Return a stable hash of text used to detect unchanged files and chunks."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
 def parse_case_study(file_path: str) -> Dict[str, str]:
     """Extract title, source and content from a case study text file."""
     with open(file_path, 'r', encoding='utf-8') as file:
         content = file.read()
     
+    content_hash = compute_content_hash(content)
+    
     # Extract title and source if they exist
     title_match = re.search(r'Title:\s*(.*?)(?=\n|$)', content)
     source_match = re.search(r'Source:\s*(.*?)(?=\n|$)', content)
@@ -104,6 +109,7 @@ def parse_case_study(file_path: str) -> Dict[str, str]:
         "title": title,
         "source": source,
         "content": content,
+        "content_hash": content_hash,
         "source_file": os.path.basename(file_path)
     }
 
@@ -128,94 +134,318 @@ def extract_summary(content: str, max_length: int = 1024) -> str:
     
     return summary.strip()
 
-def extract_metadata_with_zero_shot(classifier, content: str, title: str) -> Dict[str, Any]:
-    """Use zero-shot classification to extract metadata from case study content."""
-    metadata = {}
-    
-    # Prepare text by combining title and first part of content
+def prepare_classification_text(content: str, title: str) -> Tuple[str, str]:
+    """Build the (summary, premise) pair used for classifying a case study."""
     summary = extract_summary(content)
     combined_text = f"{title}. {summary}"
-    processed_text = preprocess_text(combined_text)
-    
-    # Generate summary
+    return summary, preprocess_text(combined_text)
+
+def score_label_pairs(classifier, premises: List[str], batch_size: int = CLASSIFY_BATCH_SIZE) -> List[Dict[str, Dict[str, np.ndarray]]]:
+    """
+    Score every CATEGORIES label against every premise with batched NLI forward passes.
+
+    All (premise, hypothesis) pairs across all categories and documents are flattened and
+    run through the model in batches of `batch_size` pairs, sorted by length to minimise
+    padding, instead of one pipeline call per category per document.
+
+    Returns one dict per premise mapping category -> {"entailment": logits, "contradiction": logits}.
+    """
+    model = classifier.model
+    tokenizer = classifier.tokenizer
+    entailment_id = classifier.entailment_id
+    # Same choice as the zero-shot pipeline's multi-label scoring
+    contradiction_id = -1 if entailment_id == 0 else 0
+
+    pairs = []
+    for doc_idx, premise in enumerate(premises):
+        for category, options in CATEGORIES.items():
+            for label_idx, label in enumerate(options):
+                pairs.append((doc_idx, category, label_idx, premise, HYPOTHESIS_TEMPLATE.format(label)))
+
+    # Sort by premise length so each batch pads to a similar size
+    order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][3]) + len(pairs[i][4]))
+
+    results = [
+        {
+            category: {
+                "entailment": np.zeros(len(options), dtype=np.float32),
+                "contradiction": np.zeros(len(options), dtype=np.float32),
+            }
+            for category, options in CATEGORIES.items()
+        }
+        for _ in premises
+    ]
+
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            batch = [pairs[i] for i in order[start:start + batch_size]]
+            inputs = tokenizer(
+                [p[3] for p in batch],
+                [p[4] for p in batch],
+                return_tensors="pt",
+                padding=True,
+                truncation="only_first",
+            ).to(model.device)
+            logits = model(**inputs).logits.float().cpu().numpy()
+            for (doc_idx, category, label_idx, _, _), row in zip(batch, logits):
+                results[doc_idx][category]["entailment"][label_idx] = row[entailment_id]
+                results[doc_idx][category]["contradiction"][label_idx] = row[contradiction_id]
+
+    return results
+
+def _softmax(x: np.ndarray, axis: int = -1) -> np.ndarray:
+    e = np.exp(x - np.max(x, axis=axis, keepdims=True))
+    return e / e.sum(axis=axis, keepdims=True)
+
+def metadata_from_scores(summary: str, scores: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, Any]:
+    """Turn raw NLI logits into the metadata dict produced by zero-shot classification."""
+    metadata = {}
     metadata["summary"] = summary[:250] + "..." if len(summary) > 250 else summary
-    
-    # Classify each category
+
     for category, options in CATEGORIES.items():
-        if category in ['key_challenges', 'core_strategies']:
-            # For multi-label categories, we'll get top 3
-            results = classifier(processed_text, options, multi_label=True)
-            top_indices = np.argsort(results['scores'])[-3:][::-1]
-            # Only include options with a score above 0.3
-            top_items = [results['labels'][i] for i in top_indices if results['scores'][i] > 0.3]
-            metadata[category] = top_items
+        entail = scores[category]["entailment"]
+        if category in MULTI_LABEL_CATEGORIES:
+            # Independent entailment-vs-contradiction probability per label, top 3 above 0.3
+            probs = _softmax(np.stack([scores[category]["contradiction"], entail], axis=-1))[:, 1]
+            top_indices = np.argsort(probs)[-3:][::-1]
+            metadata[category] = [options[i] for i in top_indices if probs[i] > 0.3]
         else:
-            # For single-label categories
-            results = classifier(processed_text, options, multi_label=False)
-            metadata[category] = results['labels'][0]
-    
+            # Single label: softmax of entailment logits across the category's options
+            probs = _softmax(entail)
+            metadata[category] = options[int(np.argmax(probs))]
+
     return metadata
 
+def extract_metadata_batch(classifier, case_studies: List[Dict[str, str]], batch_size: int = CLASSIFY_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """Classify many case studies at once, scoring all categories in shared NLI batches."""
+    prepared = [prepare_classification_text(cs["content"], cs["title"]) for cs in case_studies]
+    all_scores = score_label_pairs(classifier, [premise for _, premise in prepared], batch_size)
+    return [metadata_from_scores(summary, scores) for (summary, _), scores in zip(prepared, all_scores)]
+
+def extract_metadata_with_zero_shot(classifier, content: str, title: str) -> Dict[str, Any]:
+    """Use zero-shot classification to extract metadata from case study content."""
+    return extract_metadata_batch(classifier, [{"content": content, "title": title}])[0]
+
+class EmbeddingClassifier:
+    """
+    Assign CATEGORIES options by cosine similarity between a document embedding and
+    precomputed label embeddings.
+    
+    The document embedding is the mean of its normalized chunk embeddings, which the
+    loader computes anyway, so classification costs one small matrix product. The label
+    embeddings (src/data/label_embeddings.py) are shared with query-time category
+    extraction and persisted by the embedding cache.
+    Single-label categories take the best match; multi-label ones keep the top 3
+    above `threshold`, mirroring extract_metadata_with_zero_shot.
+    """
+    
+    def __init__(self, embedding_model, threshold: float = EMBEDDING_LABEL_THRESHOLD,
+                 label_embeddings: Optional[LabelEmbeddings] = None):
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.label_embeddings = label_embeddings or LabelEmbeddings(embedding_model)
+    
+    def classify_vector(self, document_embedding: np.ndarray, summary: str = "") -> Dict[str, Any]:
+        """Classify a single (unnormalized) document embedding."""
+        metadata = {}
+        metadata["summary"] = summary[:250] + "..." if len(summary) > 250 else summary
+        
+        category_scores = self.label_embeddings.scores(document_embedding)
+        for category, options in CATEGORIES.items():
+            scores = category_scores[category]
+            if category in MULTI_LABEL_CATEGORIES:
+                top_indices = np.argsort(scores)[-3:][::-1]
+                metadata[category] = [options[i] for i in top_indices if scores[i] > self.threshold]
+            else:
+                metadata[category] = options[int(np.argmax(scores))]
+        
+        return metadata
+    
+    def classify(self, case_study: Dict[str, Any]) -> Dict[str, Any]:
+        """Classify an embedded case study from its chunk embeddings."""
+        summary = extract_summary(case_study["content"])
+        if not case_study.get("chunk_embeddings"):
+            # Nothing to average (empty content), fall back to embedding the title and summary
+            return self.classify_vector(self.embedding_model.embed_query(f"{case_study['title']}. {summary}"), summary)
+        chunk_matrix = normalize_rows(np.asarray(case_study["chunk_embeddings"], dtype=np.float32))
+        return self.classify_vector(chunk_matrix.mean(axis=0), summary)
+
+def classify_case_studies(classifier, case_studies: List[Dict[str, Any]]):
+    """
+    Attach metadata to a batch of parsed case studies.
+    
+    Embedding classifiers need chunk embeddings first, so for them classification
+    is deferred to embed_case_study.
+    """
+    if isinstance(classifier, EmbeddingClassifier):
+        return
+    # Case studies restored from a run checkpoint already carry metadata
+    pending = [case_study for case_study in case_studies if "metadata" not in case_study]
+    if not pending:
+        return
+    for case_study, metadata in zip(pending, extract_metadata_batch(classifier, pending)):
+        case_study["metadata"] = metadata
+
 def chunk_text(content: str, text_splitter: RecursiveCharacterTextSplitter) -> List[Document]:
     """Split case study content into chunks for embedding."""
-    return text_splitter.create_documents([content])
+    chunks = text_splitter.create_documents([content])
+    for chunk in chunks:
+        chunk.metadata["content_hash"] = compute_content_hash(chunk.page_content)
+    return chunks
 
-def compute_embeddings(chunks: List[Document], embeddings) -> List[np.ndarray]:
-    """Compute embeddings for text chunks."""
-    texts = [chunk.page_content for chunk in chunks]
-    return embeddings.embed_documents(texts)
+def compute_embeddings(chunks: List[Document], embeddings, existing: Optional[Dict[str, Any]] = None) -> List[np.ndarray]:
+    """
+    Compute embeddings for text chunks.
+    
+    `existing` maps chunk content hashes to previously stored embeddings; matching
+    chunks reuse them and only new or changed chunks are sent to the embedding model.
+    """
+    existing = existing or {}
+    missing = [chunk for chunk in chunks if chunk.metadata.get("content_hash") not in existing]
+    if not missing:
+        return [existing[chunk.metadata["content_hash"]] for chunk in chunks]
+    
+    computed = iter(embeddings.embed_documents([chunk.page_content for chunk in missing]))
+    return [
+        existing[chunk.metadata["content_hash"]] if chunk.metadata.get("content_hash") in existing else next(computed)
+        for chunk in chunks
+    ]
 
-def insert_case_study(conn, case_study: Dict[str, Any]) -> int:
-    """Insert case study into database and return the ID."""
+def get_ingested_case_studies(conn) -> Dict[str, Dict[str, Any]]:
+    """Return the latest ingested id and content hash for each source file."""
     cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        SELECT DISTINCT ON (source_file) source_file, id, content_hash
+        FROM case_studies
+        WHERE source_file IS NOT NULL
+        ORDER BY source_file, id DESC
+        """)
+        return {row[0]: {"id": row[1], "content_hash": row[2]} for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+def get_chunk_embeddings_by_hash(conn, case_study_id: int, version: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return stored chunk embeddings of a case study (in an embedding version) keyed by chunk content hash."""
+    table = "case_study_chunks" if is_base_version(version) else version["chunk_table"]
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"SELECT content_hash, embedding FROM {table} WHERE case_study_id = %s AND content_hash IS NOT NULL AND embedding IS NOT NULL",
+            (case_study_id,)
+        )
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+def apply_dedup(conn, detector: NearDuplicateDetector, case_study: Dict[str, Any]) -> bool:
+    """
+    Run near-duplicate detection on a parsed case study.
     
-    query = """
-    INSERT INTO case_studies (
-        title, 
-        source_url,
-        summary,
-        industry, 
-        company_size, 
-        business_model, 
-        growth_stage, 
-        key_challenges, 
-        core_strategies, 
-        source_file, 
-        content, 
-        raw_metadata
-    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    RETURNING id
+    Returns False when it should be skipped. In 'link' mode duplicates are kept and
+    take over the original's metadata, so they are not classified again.
+    """
+    duplicate_of = detector.check_document(case_study)
+    if duplicate_of is None:
+        return True
+    if detector.action != "link":
+        return False
+    metadata = get_canonical_metadata(conn, duplicate_of)
+    if metadata is not None and "metadata" not in case_study:
+        case_study["metadata"] = dict(metadata, duplicate_of=duplicate_of)
+    return True
+
+def needs_processing(case_study: Dict[str, Any], ingested: Dict[str, Dict[str, Any]], force: bool = False) -> bool:
+    """
+    Check a parsed case study against what is already ingested.
+    
+    Sets `case_study["id"]` when the source file exists so it is updated in place, and
+    returns False when its content hash is unchanged.
     """
+    previous = ingested.get(case_study["source_file"])
+    if previous is None:
+        return True
+    case_study["id"] = previous["id"]
+    return force or previous["content_hash"] != case_study["content_hash"]
+
+def insert_case_study(conn, case_study: Dict[str, Any], commit: bool = True) -> int:
+    """Insert case study into database (or update it in place if it has an id) and return the ID."""
+    cursor = conn.cursor()
+    
+    values = (
+        case_study["title"],
+        case_study["source"],
+        case_study["metadata"].get("summary", ""),
+        case_study["metadata"].get("industry", "Unknown"),
+        case_study["metadata"].get("company_size", "Unknown"),
+        case_study["metadata"].get("business_model", "Unknown"),
+        case_study["metadata"].get("growth_stage", "Unknown"),
+        case_study["metadata"].get("key_challenges", []),
+        case_study["metadata"].get("core_strategies", []),
+        case_study["source_file"],
+        case_study["content"],
+        case_study.get("content_hash"),
+        json.dumps(case_study["metadata"])
+    )
+    
+    if case_study.get("id") is not None:
+        query = """
+        UPDATE case_studies SET
+            title = %s, 
+            source_url = %s,
+            summary = %s,
+            industry = %s, 
+            company_size = %s, 
+            business_model = %s, 
+            growth_stage = %s, 
+            key_challenges = %s, 
+            core_strategies = %s, 
+            source_file = %s, 
+            content = %s, 
+            content_hash = %s,
+            raw_metadata = %s
+        WHERE id = %s
+        RETURNING id
+        """
+        values = values + (case_study["id"],)
+    else:
+        query = """
+        INSERT INTO case_studies (
+            title, 
+            source_url,
+            summary,
+            industry, 
+            company_size, 
+            business_model, 
+            growth_stage, 
+            key_challenges, 
+            core_strategies, 
+            source_file, 
+            content, 
+            content_hash,
+            raw_metadata
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+        """
     
     try:
-        cursor.execute(query, (
-            case_study["title"],
-            case_study["source"],
-            case_study["metadata"].get("summary", ""),
-            case_study["metadata"].get("industry", "Unknown"),
-            case_study["metadata"].get("company_size", "Unknown"),
-            case_study["metadata"].get("business_model", "Unknown"),
-            case_study["metadata"].get("growth_stage", "Unknown"),
-            case_study["metadata"].get("key_challenges", []),
-            case_study["metadata"].get("core_strategies", []),
-            case_study["source_file"],
-            case_study["content"],
-            json.dumps(case_study["metadata"])
-        ))
+        cursor.execute(query, values)
         
         case_study_id = cursor.fetchone()[0]
-        conn.commit()
+        if commit:
+            conn.commit()
         return case_study_id
     
     except Exception as e:
-        conn.rollback()
+        if commit:
+            conn.rollback()
         logger.error(f"Error inserting case study: {e}")
         raise
     finally:
         cursor.close()
 
-def insert_chunks(conn, case_study_id: int, chunks: List[Document], embeddings_list: List[np.ndarray]):
-    """Insert chunks and their embeddings into database."""
+def insert_chunks(conn, case_study_id: int, chunks: List[Document], embeddings_list: List[np.ndarray], commit: bool = True):
+    """Insert (or replace) the chunks and their embeddings for a case study."""
     cursor = conn.cursor()
     
     # Prepare data for batch insert
@@ -225,69 +455,216 @@ def insert_chunks(conn, case_study_id: int, chunks: List[Document], embeddings_l
             case_study_id,
             i,
             chunk.page_content,
+            chunk.metadata.get("content_hash"),
             embedding
         ))
     
+    # Upsert so re-ingested case studies are updated in place
     query = """
-    INSERT INTO case_study_chunks (case_study_id, chunk_number, content, embedding)
+    INSERT INTO case_study_chunks (case_study_id, chunk_number, content, content_hash, embedding)
     VALUES %s
+    ON CONFLICT (case_study_id, chunk_number)
+    DO UPDATE SET
+        content = EXCLUDED.content,
+        content_hash = EXCLUDED.content_hash,
+        embedding = EXCLUDED.embedding
     """
     
     try:
-        execute_values(cursor, query, chunk_data)
-        conn.commit()
+        if chunk_data:
+            execute_values(cursor, query, chunk_data)
+        # Drop trailing chunks left over from a longer previous version
+        cursor.execute(
+            "DELETE FROM case_study_chunks WHERE case_study_id = %s AND chunk_number >= %s",
+            (case_study_id, len(chunk_data))
+        )
+        if commit:
+            conn.commit()
     except Exception as e:
-        conn.rollback()
+        if commit:
+            conn.rollback()
         logger.error(f"Error inserting chunks: {e}")
         raise
     finally:
         cursor.close()
 
-def process_case_studies(directory_path: str):
-    """Process all text files in the directory and populate the database."""
-    conn = connect_to_db()
-    classifier, embedding_model = setup_classifiers()
-    
-    # Create text splitter for chunking
-    text_splitter = RecursiveCharacterTextSplitter(
+def list_case_study_files(directory_path: str) -> List[str]:
+    """Return all case study text files in the directory."""
+    return [os.path.join(directory_path, f) for f in os.listdir(directory_path) 
+            if f.endswith('.txt') and os.path.isfile(os.path.join(directory_path, f))]
+
+def get_text_splitter() -> RecursiveCharacterTextSplitter:
+    """Create the text splitter used for chunking case studies."""
+    return RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP
     )
+
+def embed_case_study(case_study: Dict[str, Any], text_splitter: RecursiveCharacterTextSplitter, embedding_model, existing_embeddings: Optional[Dict[str, Any]] = None, classifier=None, detector: Optional[NearDuplicateDetector] = None):
+    """
+    Chunk a case study and compute its chunk and category embeddings.
+    
+    If the case study has no metadata yet, `classifier` (an EmbeddingClassifier)
+    classifies it from the chunk embeddings before the category embedding is built.
+    With a `detector`, chunks that near-duplicate other case studies' chunks are
+    dropped before embedding.
+    """
+    case_study["chunks"] = chunk_text(case_study["content"], text_splitter)
+    if detector is not None:
+        case_study["chunks"] = detector.filter_chunks(case_study)
+    case_study["chunk_embeddings"] = compute_embeddings(case_study["chunks"], embedding_model, existing_embeddings)
+    if "metadata" not in case_study:
+        case_study["metadata"] = classifier.classify(case_study)
+    case_study["categories"] = format_categories_for_embedding(case_study["metadata"])
+    case_study["category_embedding"] = embedding_model.embed_query(categories_to_text(case_study["categories"]))
+
+def write_case_study(conn, case_study: Dict[str, Any], ledger: Optional[IngestionLedger] = None, version: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Write an embedded case study, its chunks and its category embedding to the database
+    in a single transaction, marking it committed in the run ledger in the same one.
+    
+    For a non-base embedding `version` the base vector columns are left NULL and the
+    vectors go to the version's tables instead.
+    """
+    previous_id = case_study.get("id")
+    base = is_base_version(version)
+    try:
+        case_study["id"] = insert_case_study(conn, case_study, commit=False)
+        chunk_embeddings = case_study["chunk_embeddings"] if base else [None] * len(case_study["chunks"])
+        insert_chunks(conn, case_study["id"], case_study["chunks"], chunk_embeddings, commit=False)
+        insert_category_embedding(conn, case_study["id"], case_study["categories"],
+                                  case_study["category_embedding"] if base else None, commit=False)
+        if not base:
+            write_version_embeddings(conn, version, case_study)
+        if ledger is not None:
+            ledger.mark_committed(conn, case_study)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        case_study["id"] = previous_id
+        raise
+    return case_study["id"]
+
+def process_case_studies(directory_path: str, force: bool = False, bulk: bool = False, resume: Optional[str] = None):
+    """
+    Process all text files in the directory and populate the database.
+    
+    Files whose content hash matches what is already ingested are skipped; changed
+    files are updated in place. Pass `force=True` to re-process everything, and
+    `bulk=True` to write with binary COPY in large batches (for backfills).
+    
+    Progress is checkpointed per file in an ingestion run ledger; pass a run id (or
+    'latest') as `resume` to continue an interrupted run where it stopped.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    # Embed with, and write to, the embedding version retrieval currently reads
+    version = get_active_version(conn, refresh=True)
+    if bulk and not is_base_version(version):
+        logger.warning(f"Bulk loading only supports the base embedding version; writing version {version['id']} per document")
+        bulk = False
+    classifier, embedding_model = setup_classifiers(version=version)
+    
+    # Create text splitter for chunking
+    text_splitter = get_text_splitter()
     
     # Get all text files in the directory
-    file_paths = [os.path.join(directory_path, f) for f in os.listdir(directory_path) 
-                  if f.endswith('.txt') and os.path.isfile(os.path.join(directory_path, f))]
+    file_paths = list_case_study_files(directory_path)
     
     logger.info(f"Found {len(file_paths)} text files to process")
+    ingested = get_ingested_case_studies(conn)
+    skipped = 0
+    ledger = IngestionLedger.start(str(directory_path), resume)
+    detector = NearDuplicateDetector() if DEDUP_ENABLED else None
+    bulk_loader = BulkLoader(conn, ledger=ledger, on_flush=detector.record_chunks if detector else None,
+                             full_load=force) if bulk else None
+    duplicates = 0
     
-    for file_path in tqdm(file_paths, desc="Processing case studies"):
-        try:
-            # Parse case study from file
-            case_study = parse_case_study(file_path)
-            
-            # Extract metadata using zero-shot classification
-            metadata = extract_metadata_with_zero_shot(classifier, case_study["content"], case_study["title"])
-            case_study["metadata"] = metadata
-            
-            # Insert case study into database
-            case_study_id = insert_case_study(conn, case_study)
-            
-            # Chunk text and compute embeddings
-            chunks = chunk_text(case_study["content"], text_splitter)
-            chunk_embeddings = compute_embeddings(chunks, embedding_model)
-            
-            # Insert chunks and embeddings into database
-            insert_chunks(conn, case_study_id, chunks, chunk_embeddings)
-
-            # Insert category embeddings
-            populate_category_embeddings(conn, case_study)
-            
-            logger.info(f"Successfully processed case study: {case_study['title']}")
-            
-        except Exception as e:
-            logger.error(f"Error processing {file_path}: {e}")
-    
-    conn.close()
+    try:
+        with tqdm(total=len(file_paths), desc="Processing case studies") as progress:
+            for batch_start in range(0, len(file_paths), CLASSIFY_DOC_BATCH_SIZE):
+                batch_paths = file_paths[batch_start:batch_start + CLASSIFY_DOC_BATCH_SIZE]
+                
+                # Parse case studies from files
+                parsed = []
+                for file_path in batch_paths:
+                    try:
+                        case_study = parse_case_study(file_path)
+                    except Exception as e:
+                        logger.error(f"Error parsing {file_path}: {e}")
+                        continue
+                    if not needs_processing(case_study, ingested, force) or ledger.restore(case_study):
+                        skipped += 1
+                    elif detector is not None and not apply_dedup(conn, detector, case_study):
+                        duplicates += 1
+                    else:
+                        parsed.append(case_study)
+                
+                if not parsed:
+                    progress.update(len(batch_paths))
+                    continue
+                ledger.mark(parsed, PARSED)
+                
+                # Extract metadata for the whole batch (zero-shot mode classifies here)
+                try:
+                    classify_case_studies(classifier, parsed)
+                except Exception as e:
+                    logger.error(f"Error classifying batch starting at {batch_paths[0]}: {e}")
+                    for case_study in parsed:
+                        ledger.mark_failed(case_study, e)
+                    progress.update(len(batch_paths))
+                    continue
+                ledger.mark([cs for cs in parsed if "metadata" in cs], CLASSIFIED)
+                
+                for case_study in parsed:
+                    try:
+                        # Reuse stored embeddings for chunks that did not change
+                        existing_embeddings = (
+                            get_chunk_embeddings_by_hash(conn, case_study["id"], version) if case_study.get("id") else {}
+                        )
+                        
+                        # Chunk text and compute chunk and category embeddings
+                        embed_case_study(case_study, text_splitter, embedding_model, existing_embeddings, classifier, detector)
+                        ledger.mark([case_study], EMBEDDED)
+                        
+                        # Insert (or update) case study, chunks and category embedding atomically
+                        if bulk_loader is not None:
+                            bulk_loader.add(case_study)
+                        else:
+                            write_case_study(conn, case_study, ledger, version)
+                            if detector is not None:
+                                detector.record_chunks(case_study)
+                        
+                        logger.info(f"Successfully processed case study: {case_study['title']}")
+                        
+                    except Exception as e:
+                        logger.error(f"Error processing {case_study['source_file']}: {e}")
+                        ledger.mark_failed(case_study, e)
+                
+                if detector is not None:
+                    detector.save()
+                progress.update(len(batch_paths))
+        
+        if bulk_loader is not None:
+            try:
+                bulk_loader.close()
+            except Exception as e:
+                # The batch was marked failed in the ledger; finish the run so it can be inspected
+                logger.error(f"Error writing the last bulk load batch: {e}")
+        if detector is not None:
+            detector.save()
+        ledger.finish()
+        
+        # Build vector indexes missing after a first load (rebuild tuned ones with src/data/vector_indexes.py)
+        ensure_vector_indexes(conn, version)
+        
+        logger.info(f"Skipped {skipped} unchanged and {duplicates} near-duplicate case studies")
+    finally:
+        if bulk_loader is not None:
+            # Rebuild vector indexes dropped for a load that stopped early
+            bulk_loader.close(flush_pending=False)
+        ledger.close()
+        pool.putconn(conn)
 
 def format_categories_for_embedding(case_study: Dict[str, Any]) -> Dict[str, List[str]]:
     """Format case study categories into a consistent structure for embedding."""
@@ -318,16 +695,46 @@ def categories_to_text(categories: Dict[str, List[str]]) -> str:
     
     return ". ".join(text_parts)
 
+def insert_category_embedding(conn, case_study_id: int, categories: Dict[str, List[str]], embedding, commit: bool = True):
+    """Insert or update the category embedding row for a case study."""
+    cursor = conn.cursor()
+    
+    query = """
+    INSERT INTO case_study_category_embeddings 
+        (case_study_id, categories_json, categories_embedding)
+    VALUES 
+        (%s, %s, %s)
+    ON CONFLICT (case_study_id) 
+    DO UPDATE SET 
+        categories_json = EXCLUDED.categories_json,
+        categories_embedding = EXCLUDED.categories_embedding,
+        created_at = CURRENT_TIMESTAMP
+    """
+    
+    try:
+        cursor.execute(query, (
+            case_study_id,
+            json.dumps(categories),
+            embedding
+        ))
+        if commit:
+            conn.commit()
+    except Exception as e:
+        if commit:
+            conn.rollback()
+        logger.error(f"Error inserting category embedding: {e}")
+        raise
+    finally:
+        cursor.close()
+
 def populate_category_embeddings(conn, case_study):
     """Generate and store embeddings for all case studies' categories."""
     # Initialize embedding model
     embedding_model = get_embedding_model()
     
-    cursor = conn.cursor()
-    
     try:
-        # Format categories
-        categories = format_categories_for_embedding(case_study)
+        # Format categories from the classified metadata
+        categories = format_categories_for_embedding(case_study.get("metadata", case_study))
         
         # Convert to text for embedding
         categories_text = categories_to_text(categories)
@@ -336,28 +743,47 @@ def populate_category_embeddings(conn, case_study):
         embedding = embedding_model.embed_query(categories_text)
         
         # Insert or update in database
-        query = """
-        INSERT INTO case_study_category_embeddings 
-            (case_study_id, categories_json, categories_embedding)
-        VALUES 
-            (%s, %s, %s)
-        ON CONFLICT (case_study_id) 
-        DO UPDATE SET 
-            categories_json = EXCLUDED.categories_json,
-            categories_embedding = EXCLUDED.categories_embedding,
-            created_at = CURRENT_TIMESTAMP
-        """
-        
-        cursor.execute(query, (
-            case_study["id"],
-            json.dumps(categories),
-            embedding
-        ))
+        insert_category_embedding(conn, case_study["id"], categories, embedding)
     
     except Exception as e:
-        logger.error(f"Error processing case study {case_study['id']}: {e}")
+        logger.error(f"Error processing case study {case_study.get('id')}: {e}")
+
+
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Ingest case study text files into the database.")
+    parser.add_argument("directory", nargs="?", default=str(RAW_DATA_DIR), help="Directory of case study .txt files")
+    parser.add_argument("--pipeline", action="store_true", help="Use the staged, concurrent ingestion pipeline")
+    parser.add_argument("--force", action="store_true", help="Re-process files even if their content is unchanged")
+    parser.add_argument("--bulk", action="store_true", help="Write with binary COPY in large batches and rebuild indexes afterwards")
+    parser.add_argument("--resume", nargs="?", const="latest", default=None, metavar="RUN_ID",
+                        help="Resume an interrupted ingestion run (defaults to the latest unfinished one)")
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--classify-workers", type=int, default=None)
+    parser.add_argument("--embed-workers", type=int, default=None)
+    parser.add_argument("--write-workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=None)
+    args = parser.parse_args()
+
+    if not args.pipeline:
+        process_case_studies(args.directory, force=args.force, bulk=args.bulk, resume=args.resume)
+        return
+
+    from src.data.pipeline import process_case_studies_pipelined
+    overrides = {
+        key: value for key, value in {
+            "parse_workers": args.parse_workers,
+            "classify_workers": args.classify_workers,
+            "embed_workers": args.embed_workers,
+            "write_workers": args.write_workers,
+            "queue_size": args.queue_size,
+        }.items() if value is not None
+    }
+    process_case_studies_pipelined(args.directory, force=args.force, bulk=args.bulk, resume=args.resume, **overrides)
+
+if __name__ == "__main__":
+    main()
 
 
 # import os
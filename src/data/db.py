@@ -1,8 +1,18 @@
 import os
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, List, Optional
 import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
 from dotenv import load_dotenv
 from pgvector.psycopg2 import register_vector
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 # Get database connection parameters from environment variables
@@ -12,8 +22,27 @@ dbname = os.getenv("POSTGRES_DB")
 user = os.getenv("POSTGRES_USER")
 password = os.getenv("POSTGRES_PASSWORD")
 
+# Connection Pool Settings
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_HEALTHCHECK_AFTER = float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30"))  # ping connections idle longer than this
+
 emb_size = 1024  # for mxbai-embed-large
 
+# Model the base embedding columns were created for (embedding version 1)
+BASE_EMBEDDING_PROVIDER = os.getenv("MODEL_PROVIDER", "ollama").lower()
+BASE_EMBEDDING_MODEL = os.getenv(
+    "EMBEDDING_MODEL", "text-embedding-3-large" if BASE_EMBEDDING_PROVIDER == "openai" else "mxbai-embed-large"
+)
+
+# Approximate nearest neighbour indexes on the embedding columns: name -> (table, column).
+# They are built after data load by src/data/vector_indexes.py.
+VECTOR_INDEXES = {
+    "idx_case_study_category_embeddings": ("case_study_category_embeddings", "categories_embedding"),
+    "idx_case_study_chunks_embedding": ("case_study_chunks", "embedding"),
+}
+
 def connect_to_db():
     """Establish connection to PostgreSQL database."""
     conn = psycopg2.connect(
@@ -26,6 +55,265 @@ def connect_to_db():
     register_vector(conn)
     return conn
 
+class ConnectionPool:
+    """
+    Thread-safe pool of connections created by connect_to_db (so pgvector types are
+    registered once per connection).
+
+    `getconn` blocks up to `timeout` seconds when all `maxconn` connections are in use.
+    Connections idle for longer than `healthcheck_after` seconds are pinged before being
+    handed out and replaced if broken; returned connections are rolled back so each
+    checkout starts outside a transaction.
+    """
+
+    def __init__(self, minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX, timeout: float = DB_POOL_TIMEOUT,
+                 healthcheck_after: float = DB_POOL_HEALTHCHECK_AFTER, factory: Callable[[], Any] = connect_to_db):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_after = healthcheck_after
+        self.factory = factory
+        self._idle: List[tuple] = []  # (connection, returned_at)
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._available = threading.Semaphore(maxconn)
+        self.metrics = {"created": 0, "checkouts": 0, "waits": 0, "wait_seconds": 0.0, "timeouts": 0, "discarded": 0}
+        for _ in range(minconn):
+            self._idle.append((self._create(), time.monotonic()))
+
+    def _create(self):
+        conn = self.factory()
+        with self._lock:
+            self.metrics["created"] += 1
+        return conn
+
+    def _healthy(self, conn, idle_since: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.healthcheck_after:
+            return True
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Check out a connection, waiting for one to be returned if the pool is exhausted."""
+        start = time.monotonic()
+        if not self._available.acquire(blocking=False):
+            with self._lock:
+                self.metrics["waits"] += 1
+            if not self._available.acquire(timeout=self.timeout):
+                with self._lock:
+                    self.metrics["timeouts"] += 1
+                raise PoolError(f"No database connection available within {self.timeout}s")
+            with self._lock:
+                self.metrics["wait_seconds"] += time.monotonic() - start
+        try:
+            while True:
+                with self._lock:
+                    idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    conn = self._create()
+                    break
+                conn, idle_since = idle
+                if self._healthy(conn, idle_since):
+                    break
+                with self._lock:
+                    self.metrics["discarded"] += 1
+                self._close_quietly(conn)
+        except Exception:
+            self._available.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self.metrics["checkouts"] += 1
+        return conn
+
+    def putconn(self, conn, close: bool = False):
+        """Return a connection to the pool (or close it if it is broken or `close` is set)."""
+        if not close and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+        if close or conn.closed:
+            self._close_quietly(conn)
+            with self._lock:
+                self.metrics["discarded"] += 1
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        with self._lock:
+            self._in_use -= 1
+        self._available.release()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """`with pool.connection() as conn:` checks a connection out for the block."""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool usage counters for monitoring."""
+        with self._lock:
+            return dict(self.metrics, in_use=self._in_use, idle=len(self._idle), max=self.maxconn,
+                        wait_seconds=round(self.metrics["wait_seconds"], 3))
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+class AsyncConnectionPool:
+    """
+    asyncio front-end to a ConnectionPool. psycopg2 has no native asyncio support, so
+    checkouts and queries run in worker threads without blocking the event loop.
+    """
+
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        self.pool = pool or get_pool()
+
+    @asynccontextmanager
+    async def connection(self):
+        loop = asyncio.get_running_loop()
+        conn = await loop.run_in_executor(None, self.pool.getconn)
+        try:
+            yield conn
+        finally:
+            self.pool.putconn(conn)
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run `fn(conn, *args)` on a pooled connection in a worker thread."""
+        async with self.connection() as conn:
+            return await asyncio.get_running_loop().run_in_executor(None, fn, conn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.pool.stats()
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+            logger.info(f"Created database connection pool (max {_pool.maxconn} connections)")
+        return _pool
+
+@contextmanager
+def pooled_connection():
+    """Check a connection out of the shared pool for the duration of a `with` block."""
+    with get_pool().connection() as conn:
+        yield conn
+
+def drop_vector_indexes(cursor):
+    """Drop the vector indexes, e.g. before a bulk load."""
+    for name in VECTOR_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+def create_ingestion_ledger_tables(cursor):
+    """Create the tables tracking ingestion runs and per-file progress."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ingestion_runs (
+        id SERIAL PRIMARY KEY,
+        directory TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'running',  -- running/completed
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ingestion_run_files (
+        run_id INTEGER REFERENCES ingestion_runs(id),
+        source_file TEXT NOT NULL,
+        content_hash TEXT,
+        state TEXT NOT NULL,  -- parsed/classified/embedded/committed/failed
+        metadata JSONB,
+        case_study_id INTEGER,
+        error TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (run_id, source_file)
+    )
+    """)
+
+def create_signature_table(cursor):
+    """Create the table persisting MinHash signatures for near-duplicate detection."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS minhash_signatures (
+        kind TEXT NOT NULL,  -- document/chunk
+        key TEXT NOT NULL,   -- source file for documents, content hash for chunks
+        case_study_id INTEGER,
+        signature BYTEA NOT NULL,
+        duplicate_of TEXT,
+        PRIMARY KEY (kind, key)
+    )
+    """)
+
+def create_embedding_version_table(cursor):
+    """
+    Create the embedding version registry. Version 1 is the vector columns of the base
+    tables; later versions live in their own tables (see src/data/embedding_versions.py).
+    """
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS embedding_versions (
+        id SERIAL PRIMARY KEY,
+        provider TEXT NOT NULL,
+        model TEXT NOT NULL,
+        dim INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'building',  -- building/active/retired
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        activated_at TIMESTAMP
+    )
+    """)
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_embedding_versions_active ON embedding_versions(status) WHERE status = 'active'"
+    )
+    cursor.execute("""
+    INSERT INTO embedding_versions (id, provider, model, dim, status, activated_at)
+    SELECT 1, %s, %s, %s, 'active', CURRENT_TIMESTAMP
+    WHERE NOT EXISTS (SELECT 1 FROM embedding_versions)
+    """, (BASE_EMBEDDING_PROVIDER, BASE_EMBEDDING_MODEL, emb_size))
+    cursor.execute("SELECT setval('embedding_versions_id_seq', GREATEST((SELECT MAX(id) FROM embedding_versions), 1))")
+
+def create_search_columns(cursor):
+    """
+    Add generated full-text search columns (with GIN indexes) to case studies and
+    chunks for lexical and hybrid retrieval.
+    """
+    cursor.execute("""
+    ALTER TABLE case_studies ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED
+    """)
+    cursor.execute("""
+    ALTER TABLE case_study_chunks ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_case_studies_search_vector ON case_studies USING GIN (search_vector)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_case_study_chunks_search_vector ON case_study_chunks USING GIN (search_vector)")
+
 def setup_db():
     """ One-time setup of Postgres database for business strategy generator """
     # Connect to PostgreSQL
@@ -72,6 +360,7 @@ def setup_db():
         core_strategies TEXT[],
         source_file TEXT,
         content TEXT,
+        content_hash TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         raw_metadata JSONB
     )
@@ -83,6 +372,7 @@ def setup_db():
         case_study_id INTEGER REFERENCES case_studies(id),
         chunk_number INTEGER NOT NULL,
         content TEXT NOT NULL,
+        content_hash TEXT,
         embedding vector({emb_size}),
         UNIQUE(case_study_id, chunk_number)
     )
@@ -99,19 +389,32 @@ def setup_db():
     """)
 
 
+    # Ingestion run ledger for resumable loads
+    create_ingestion_ledger_tables(cursor)
+
+    # MinHash signatures for near-duplicate detection
+    create_signature_table(cursor)
+
+    # Embedding version registry for zero-downtime model switches
+    create_embedding_version_table(cursor)
+
+    # Full-text search columns for hybrid retrieval
+    create_search_columns(cursor)
+
+    # Content hashes for incremental ingestion on databases created before they existed
+    cursor.execute("ALTER TABLE case_studies ADD COLUMN IF NOT EXISTS content_hash TEXT")
+    cursor.execute("ALTER TABLE case_study_chunks ADD COLUMN IF NOT EXISTS content_hash TEXT")
+
     # Create indices
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_case_studies_industry ON case_studies(industry)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_case_studies_company_size ON case_studies(company_size)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_case_studies_business_model ON case_studies(business_model)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_case_studies_growth_stage ON case_studies(growth_stage)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_case_study_chunks_case_study_id ON case_study_chunks(case_study_id)")
-    cursor.execute(f"""
-    CREATE INDEX IF NOT EXISTS idx_case_study_category_embeddings 
-    ON case_study_category_embeddings USING ivfflat (categories_embedding vector_cosine_ops)
-    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_case_studies_source_file ON case_studies(source_file)")
     
-    # Vector similarity search index
-    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_case_study_chunks_embedding ON case_study_chunks USING ivfflat (embedding vector_cosine_ops)")
+    # Vector similarity search indexes are built once data is loaded (src/data/vector_indexes.py),
+    # so ivfflat centroids are trained on real rows rather than an empty table
 
     conn.commit()
     conn.close()
@@ -0,0 +1,257 @@
+import os
+import hashlib
+import logging
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+import numpy as np
+import psycopg2
+from dotenv import load_dotenv
+from src.data.db import connect_to_db, create_signature_table
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Dedup Settings
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))  # estimated Jaccard similarity
+DEDUP_ACTION = os.getenv("DEDUP_ACTION", "skip")  # 'skip' drops duplicates, 'link' ingests them with the original's metadata
+DEDUP_CHUNKS = os.getenv("DEDUP_CHUNKS", "true").lower() in ("1", "true", "yes")
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+
+DOCUMENT = "document"
+CHUNK = "chunk"
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)
+# Fixed permutations so signatures stay comparable across runs
+_PERM_A = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Word n-gram shingles of lowercased text."""
+    tokens = re.findall(r"\w+", text.lower())
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint64 values) of the text's shingle set."""
+    values = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles(text)],
+        dtype=np.uint64,
+    )
+    if values.size == 0:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        permuted = np.bitwise_and((_PERM_A[:, None] * values[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME, _MAX_HASH)
+    return permuted.min(axis=1)
+
+
+def estimated_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+def choose_bands(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """Pick (bands, rows) whose LSH threshold (1/b)^(1/r) is closest to `threshold`."""
+    options = [(num_perm // r, r) for r in range(1, num_perm + 1) if num_perm % r == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+class _LSHIndex:
+    """Banded LSH over MinHash signatures."""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.bands, self.rows = choose_bands(threshold)
+        self.buckets: Dict[Tuple[int, bytes], Set[str]] = defaultdict(set)
+        self.signatures: Dict[str, np.ndarray] = {}
+        # Case study id, or the source file of a case study not written yet
+        self.owners: Dict[str, Optional[Union[int, str]]] = {}
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def remove(self, key: str):
+        signature = self.signatures.pop(key, None)
+        self.owners.pop(key, None)
+        if signature is not None:
+            for band_key in self._band_keys(signature):
+                self.buckets[band_key].discard(key)
+
+    def add(self, key: str, signature: np.ndarray, owner: Optional[Union[int, str]] = None):
+        self.remove(key)
+        self.signatures[key] = signature
+        self.owners[key] = owner
+        for band_key in self._band_keys(signature):
+            self.buckets[band_key].add(key)
+
+    def query(self, signature: np.ndarray, exclude_key: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """Return the most similar indexed key at or above the threshold, if any."""
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates |= self.buckets.get(band_key, set())
+        candidates.discard(exclude_key)
+        best = None
+        for key in candidates:
+            similarity = estimated_jaccard(signature, self.signatures[key])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+
+class NearDuplicateDetector:
+    """
+    MinHash/LSH near-duplicate detection for case studies and their chunks.
+
+    Document signatures are keyed by source file and chunk signatures by chunk content
+    hash. Signatures are loaded from `minhash_signatures` on start and written back by
+    `save`, so detection is incremental across runs.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, action: str = DEDUP_ACTION, dedup_chunks: bool = DEDUP_CHUNKS):
+        self.threshold = threshold
+        self.action = action
+        self.dedup_chunks = dedup_chunks
+        self.indexes = {DOCUMENT: _LSHIndex(threshold), CHUNK: _LSHIndex(threshold)}
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()
+        self.duplicate_documents = 0
+        self.duplicate_chunks = 0
+        self._load()
+
+    def _load(self):
+        conn = connect_to_db()
+        cursor = conn.cursor()
+        try:
+            create_signature_table(cursor)
+            conn.commit()
+            # Duplicates are not indexed: an edited original must not match its own copy
+            cursor.execute("SELECT kind, key, case_study_id, signature FROM minhash_signatures WHERE duplicate_of IS NULL")
+            for kind, key, case_study_id, signature in cursor.fetchall():
+                self.indexes[kind].add(key, np.frombuffer(bytes(signature), dtype=np.uint64), case_study_id)
+        finally:
+            cursor.close()
+            conn.close()
+        logger.info(
+            f"Loaded {len(self.indexes[DOCUMENT].signatures)} document and "
+            f"{len(self.indexes[CHUNK].signatures)} chunk signatures"
+        )
+
+    def check_document(self, case_study: Dict[str, Any]) -> Optional[str]:
+        """
+        Fingerprint a parsed case study and compare it to everything seen so far.
+
+        Returns the source file it near-duplicates, or None. Unique documents are added
+        to the index; duplicates are recorded with `duplicate_of`.
+        """
+        signature = minhash_signature(case_study["content"])
+        key = case_study["source_file"]
+        with self._lock:
+            match = self.indexes[DOCUMENT].query(signature, exclude_key=key)
+            if match is None:
+                self.indexes[DOCUMENT].add(key, signature, case_study.get("id"))
+                self._pending.append((DOCUMENT, key, case_study.get("id"), signature, None))
+                return None
+            self.duplicate_documents += 1
+            self._pending.append((DOCUMENT, key, None, signature, match[0]))
+        logger.info(f"{key} is a near-duplicate of {match[0]} (Jaccard ~{match[1]:.2f})")
+        case_study["duplicate_of"] = match[0]
+        return match[0]
+
+    def filter_chunks(self, case_study: Dict[str, Any]) -> List[Any]:
+        """
+        Drop chunks that near-duplicate a chunk of another case study (shared
+        boilerplate), indexing the remaining ones. Returns the kept chunks.
+
+        Kept chunks of a case study that has no id yet are owned by its source file
+        until `record_chunks`, so new documents of the same run dedup against each other.
+        """
+        if not self.dedup_chunks:
+            return case_study["chunks"]
+        kept = []
+        own = case_study.get("id") if case_study.get("id") is not None else case_study["source_file"]
+        with self._lock:
+            for chunk in case_study["chunks"]:
+                key = chunk.metadata.get("content_hash")
+                signature = minhash_signature(chunk.page_content)
+                # Not excluding the chunk's own key: boilerplate shared word for word has the
+                # same key, and must match the document that indexed it first
+                match = self.indexes[CHUNK].query(signature)
+                owner = self.indexes[CHUNK].owners.get(match[0]) if match else None
+                if match is not None and owner is not None and owner not in (own, case_study["source_file"]):
+                    self.duplicate_chunks += 1
+                    continue
+                kept.append(chunk)
+                if self.indexes[CHUNK].owners.get(key) in (None, own, case_study["source_file"]):
+                    self.indexes[CHUNK].add(key, signature, own)
+        return kept
+
+    def record_chunks(self, case_study: Dict[str, Any]):
+        """Queue the signatures of a written case study's chunks for persistence."""
+        with self._lock:
+            index = self.indexes[CHUNK]
+            self.indexes[DOCUMENT].owners[case_study["source_file"]] = case_study["id"]
+            self._pending.append((DOCUMENT, case_study["source_file"], case_study["id"],
+                                  self.indexes[DOCUMENT].signatures.get(case_study["source_file"]), None))
+            for chunk in case_study["chunks"]:
+                key = chunk.metadata.get("content_hash")
+                # Never take over a chunk another case study indexed first
+                if key in index.signatures and index.owners.get(key) in (None, case_study["source_file"], case_study["id"]):
+                    index.owners[key] = case_study["id"]
+                    self._pending.append((CHUNK, key, case_study["id"], index.signatures[key], None))
+
+    def save(self):
+        """Persist signatures recorded since the last save."""
+        with self._lock:
+            rows = [
+                (kind, key, case_study_id, psycopg2.Binary(signature.tobytes()), duplicate_of)
+                for kind, key, case_study_id, signature, duplicate_of in self._pending
+                if signature is not None
+            ]
+            self._pending = []
+        if not rows:
+            return
+        conn = connect_to_db()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany("""
+            INSERT INTO minhash_signatures (kind, key, case_study_id, signature, duplicate_of)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (kind, key)
+            DO UPDATE SET
+                case_study_id = COALESCE(EXCLUDED.case_study_id, minhash_signatures.case_study_id),
+                signature = EXCLUDED.signature,
+                duplicate_of = EXCLUDED.duplicate_of
+            """, rows)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error saving MinHash signatures: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+        logger.info(
+            f"Near-duplicates so far: {self.duplicate_documents} case studies, {self.duplicate_chunks} chunks"
+        )
+
+
+def get_canonical_metadata(conn, source_file: str) -> Optional[Dict[str, Any]]:
+    """Return the classified metadata of the ingested case study for a source file."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT raw_metadata FROM case_studies WHERE source_file = %s ORDER BY id DESC LIMIT 1",
+            (source_file,)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+    finally:
+        cursor.close()
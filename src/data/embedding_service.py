@@ -0,0 +1,162 @@
+import os
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from src.data.embedding_cache import with_embedding_cache
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Model Settings
+model_provider = os.getenv("MODEL_PROVIDER", "ollama")  # 'ollama' or 'openai'
+embedding_model = os.getenv("EMBEDDING_MODEL", "mxbai-embed-large")  # Default for ollama
+
+# Micro-batching Settings
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "10"))
+EMBED_MAX_CONCURRENT_BATCHES = int(os.getenv("EMBED_MAX_CONCURRENT_BATCHES", "2"))
+
+
+def resolve_embedding_model(provider: Optional[str] = None, model_name: Optional[str] = None) -> Tuple[str, str]:
+    """Fill in the provider and model name from environment settings."""
+    provider = (provider or model_provider).lower()
+    if model_name is None:
+        if provider == "openai":
+            model_name = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+        else:
+            model_name = embedding_model
+    return provider, model_name
+
+
+def build_base_embedding_model(provider: Optional[str] = None, model_name: Optional[str] = None) -> Tuple[Embeddings, str]:
+    """Initialize the uncached embedding model and its name (defaults from environment settings)."""
+    provider, model_name = resolve_embedding_model(provider, model_name)
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        embeddings = OpenAIEmbeddings(
+            model=model_name
+        )
+    else:  # Default to ollama
+        from langchain_ollama import OllamaEmbeddings
+
+        embeddings = OllamaEmbeddings(
+            model=model_name
+        )
+
+    return embeddings, model_name
+
+
+def build_embedding_model(provider: Optional[str] = None, model_name: Optional[str] = None) -> Embeddings:
+    """Initialize the cached embedding model (defaults from environment settings)."""
+    embeddings, model_name = build_base_embedding_model(provider, model_name)
+    return with_embedding_cache(embeddings, model_name)
+
+
+class EmbeddingService(Embeddings):
+    """
+    Shared embedding front-end that coalesces single-text requests into micro-batches.
+
+    Concurrent `embed_query` calls are queued and dispatched together once
+    `max_batch_size` texts are waiting or `max_wait_ms` has passed since the first one,
+    so N concurrent sessions cost one embedding round trip instead of N. Lists passed
+    to `embed_documents` are already batched and go straight to the model.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+        max_wait_ms: float = EMBED_MAX_WAIT_MS,
+        max_concurrent_batches: int = EMBED_MAX_CONCURRENT_BATCHES,
+    ):
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix="embed-batch")
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="embed-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[tuple]):
+        texts = [text for text, _ in batch]
+        try:
+            vectors = self.embeddings.embed_documents(texts)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._stats_lock:
+            self.batches += 1
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def submit(self, text: str) -> Future:
+        """Queue a single text for embedding and return a future for its vector."""
+        future: Future = Future()
+        with self._stats_lock:
+            self.requests += 1
+        self._queue.put((text, future))
+        return future
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.embeddings.embed_documents, texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request and batch counters for monitoring coalescing efficiency."""
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            }
+
+
+_services: Dict[Tuple[str, str], EmbeddingService] = {}
+_service_lock = threading.Lock()
+
+
+def get_embedding_service(provider: Optional[str] = None, model_name: Optional[str] = None) -> EmbeddingService:
+    """
+    Return the process-wide embedding service for a model, constructing it on first use.
+    Defaults to the model configured in the environment.
+    """
+    key = resolve_embedding_model(provider, model_name)
+    with _service_lock:
+        if key not in _services:
+            logger.info(f"Setting up embedding service for {key[0]}/{key[1]}...")
+            _services[key] = EmbeddingService(build_embedding_model(*key))
+        return _services[key]
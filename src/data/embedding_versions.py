@@ -0,0 +1,169 @@
+import os
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+from src.data.db import create_embedding_version_table, get_pool
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Version 1 is stored in the vector columns of the base tables
+BASE_VERSION = 1
+# Seconds a looked-up active version is reused before checking the registry again
+ACTIVE_VERSION_TTL = float(os.getenv("ACTIVE_VERSION_TTL", "5"))
+
+_active: Optional[Dict[str, Any]] = None
+_active_checked = 0.0
+_active_lock = threading.Lock()
+
+
+def chunk_table(version_id: int) -> str:
+    return "case_study_chunks" if version_id == BASE_VERSION else f"case_study_chunk_embeddings_v{version_id}"
+
+
+def category_table(version_id: int) -> str:
+    return "case_study_category_embeddings" if version_id == BASE_VERSION else f"case_study_category_embeddings_v{version_id}"
+
+
+def _version_from_row(row) -> Dict[str, Any]:
+    version_id, provider, model, dim, status = row
+    return {
+        "id": version_id,
+        "provider": provider,
+        "model": model,
+        "dim": dim,
+        "status": status,
+        "chunk_table": chunk_table(version_id),
+        "category_table": category_table(version_id),
+    }
+
+
+def is_base_version(version: Optional[Dict[str, Any]]) -> bool:
+    return version is None or version["id"] == BASE_VERSION
+
+
+def get_version(conn, version_id: int) -> Optional[Dict[str, Any]]:
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, provider, model, dim, status FROM embedding_versions WHERE id = %s", (version_id,))
+        row = cursor.fetchone()
+        return _version_from_row(row) if row else None
+    finally:
+        cursor.close()
+
+
+def list_versions(conn) -> List[Dict[str, Any]]:
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, provider, model, dim, status FROM embedding_versions ORDER BY id")
+        return [_version_from_row(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def get_active_version(conn=None, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Return the embedding version retrieval should read, cached for ACTIVE_VERSION_TTL
+    seconds. Callers should embed queries with the version's provider/model and search
+    its tables, so one query never mixes vectors from two models.
+    """
+    global _active, _active_checked
+    with _active_lock:
+        if not refresh and _active is not None and time.monotonic() - _active_checked < ACTIVE_VERSION_TTL:
+            return _active
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_pool().getconn()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, provider, model, dim, status FROM embedding_versions WHERE status = 'active'")
+        row = cursor.fetchone()
+        if row is None:
+            # Databases set up before versioning: register the base columns as version 1
+            create_embedding_version_table(cursor)
+            conn.commit()
+            cursor.execute("SELECT id, provider, model, dim, status FROM embedding_versions WHERE status = 'active'")
+            row = cursor.fetchone()
+    finally:
+        cursor.close()
+        if own_conn:
+            get_pool().putconn(conn)
+
+    with _active_lock:
+        _active = _version_from_row(row)
+        _active_checked = time.monotonic()
+        return _active
+
+
+def create_version_tables(cursor, version: Dict[str, Any]):
+    """Create the side tables holding a non-base version's vectors."""
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {version["chunk_table"]} (
+        case_study_id INTEGER REFERENCES case_studies(id),
+        chunk_number INTEGER NOT NULL,
+        content_hash TEXT,
+        embedding vector({version["dim"]}),
+        PRIMARY KEY (case_study_id, chunk_number)
+    )
+    """)
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {version["category_table"]} (
+        case_study_id INTEGER PRIMARY KEY REFERENCES case_studies(id),
+        categories_json JSONB NOT NULL,
+        categories_embedding vector({version["dim"]})
+    )
+    """)
+
+
+def upsert_chunk_embeddings(cursor, version: Dict[str, Any], rows: List[tuple]):
+    """Upsert (case_study_id, chunk_number, content_hash, embedding) rows into a version."""
+    execute_values(cursor, f"""
+    INSERT INTO {version["chunk_table"]} (case_study_id, chunk_number, content_hash, embedding)
+    VALUES %s
+    ON CONFLICT (case_study_id, chunk_number)
+    DO UPDATE SET
+        content_hash = EXCLUDED.content_hash,
+        embedding = EXCLUDED.embedding
+    """, rows)
+
+
+def upsert_category_embeddings(cursor, version: Dict[str, Any], rows: List[tuple]):
+    """Upsert (case_study_id, categories_json, embedding) rows into a version."""
+    execute_values(cursor, f"""
+    INSERT INTO {version["category_table"]} (case_study_id, categories_json, categories_embedding)
+    VALUES %s
+    ON CONFLICT (case_study_id)
+    DO UPDATE SET
+        categories_json = EXCLUDED.categories_json,
+        categories_embedding = EXCLUDED.categories_embedding
+    """, rows)
+
+
+def write_version_embeddings(conn, version: Dict[str, Any], case_study: Dict[str, Any]):
+    """
+    Write an embedded case study's vectors into a non-base version, inside the caller's
+    (uncommitted) transaction.
+    """
+    cursor = conn.cursor()
+    try:
+        rows = [
+            (case_study["id"], i, chunk.metadata.get("content_hash"), embedding)
+            for i, (chunk, embedding) in enumerate(zip(case_study["chunks"], case_study["chunk_embeddings"]))
+        ]
+        if rows:
+            upsert_chunk_embeddings(cursor, version, rows)
+        cursor.execute(
+            f"DELETE FROM {version['chunk_table']} WHERE case_study_id = %s AND chunk_number >= %s",
+            (case_study["id"], len(rows))
+        )
+        upsert_category_embeddings(cursor, version, [
+            (case_study["id"], json.dumps(case_study["categories"]), case_study["category_embedding"])
+        ])
+    finally:
+        cursor.close()
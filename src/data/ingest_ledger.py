@@ -0,0 +1,167 @@
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+from src.data.db import connect_to_db, create_ingestion_ledger_tables
+
+logger = logging.getLogger(__name__)
+
+# Per-file states, in pipeline order
+PARSED = "parsed"
+CLASSIFIED = "classified"
+EMBEDDED = "embedded"
+COMMITTED = "committed"
+FAILED = "failed"
+
+
+class IngestionLedger:
+    """
+    Records how far each file of an ingestion run has progressed.
+
+    Intermediate states are written on the ledger's own connection so they survive a
+    crash; the `committed` state is written through the caller's connection inside the
+    document's transaction, so a file is marked committed exactly when its rows are.
+    Classified metadata is stored with the state, so resuming a run skips the
+    classifier for those files (chunk embeddings come back from the embedding cache).
+    """
+
+    def __init__(self, conn, run_id: int):
+        self.conn = conn
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        self.files = self._load_files()
+
+    @classmethod
+    def start(cls, directory: str, resume: Optional[str] = None) -> "IngestionLedger":
+        """
+        Start a new run for `directory`, or resume one.
+
+        `resume` is a run id, or 'latest' for the most recent unfinished run of the
+        directory (a new run is started if there is none).
+        """
+        conn = connect_to_db()
+        cursor = conn.cursor()
+        try:
+            create_ingestion_ledger_tables(cursor)
+            run_id = None
+            if resume == "latest":
+                cursor.execute(
+                    "SELECT id FROM ingestion_runs WHERE directory = %s AND status = 'running' ORDER BY id DESC LIMIT 1",
+                    (directory,)
+                )
+                row = cursor.fetchone()
+                run_id = row[0] if row else None
+            elif resume is not None:
+                run_id = int(resume)
+                cursor.execute("UPDATE ingestion_runs SET status = 'running', finished_at = NULL WHERE id = %s", (run_id,))
+
+            if run_id is None:
+                cursor.execute("INSERT INTO ingestion_runs (directory) VALUES (%s) RETURNING id", (directory,))
+                run_id = cursor.fetchone()[0]
+                logger.info(f"Started ingestion run {run_id}")
+            else:
+                logger.info(f"Resuming ingestion run {run_id}")
+            conn.commit()
+        finally:
+            cursor.close()
+        return cls(conn, run_id)
+
+    def _load_files(self) -> Dict[str, Dict[str, Any]]:
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT source_file, content_hash, state, metadata FROM ingestion_run_files WHERE run_id = %s",
+                (self.run_id,)
+            )
+            return {
+                row[0]: {"content_hash": row[1], "state": row[2], "metadata": row[3]}
+                for row in cursor.fetchall()
+            }
+        finally:
+            cursor.close()
+
+    def restore(self, case_study: Dict[str, Any]) -> bool:
+        """
+        Apply checkpointed progress to a freshly parsed case study.
+
+        Restores classified metadata when the file is unchanged since it was recorded,
+        and returns True if the file was already committed in this run.
+        """
+        entry = self.files.get(case_study["source_file"])
+        if entry is None or entry["content_hash"] != case_study["content_hash"]:
+            return False
+        if entry["state"] == COMMITTED:
+            return True
+        if entry["metadata"] is not None and "metadata" not in case_study:
+            case_study["metadata"] = entry["metadata"]
+        return False
+
+    def _upsert_sql(self) -> str:
+        return """
+        INSERT INTO ingestion_run_files (run_id, source_file, content_hash, state, metadata, case_study_id, error)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (run_id, source_file)
+        DO UPDATE SET
+            content_hash = EXCLUDED.content_hash,
+            state = EXCLUDED.state,
+            metadata = COALESCE(EXCLUDED.metadata, ingestion_run_files.metadata),
+            case_study_id = COALESCE(EXCLUDED.case_study_id, ingestion_run_files.case_study_id),
+            error = EXCLUDED.error,
+            updated_at = CURRENT_TIMESTAMP
+        """
+
+    def _row(self, case_study: Dict[str, Any], state: str, error: Optional[str] = None) -> tuple:
+        metadata = case_study.get("metadata")
+        return (
+            self.run_id,
+            case_study["source_file"],
+            case_study.get("content_hash"),
+            state,
+            json.dumps(metadata) if metadata is not None else None,
+            case_study.get("id"),
+            error,
+        )
+
+    def mark(self, case_studies: Iterable[Dict[str, Any]], state: str, error: Optional[str] = None):
+        """Checkpoint a state for one or more case studies on the ledger connection."""
+        rows = [self._row(case_study, state, error) for case_study in case_studies]
+        if not rows:
+            return
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.executemany(self._upsert_sql(), rows)
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                logger.error(f"Error updating ingestion ledger: {e}")
+            finally:
+                cursor.close()
+
+    def mark_failed(self, case_study: Dict[str, Any], error: Exception):
+        self.mark([case_study], FAILED, str(error))
+
+    def mark_committed(self, conn, case_study: Dict[str, Any]):
+        """Mark a case study committed inside the caller's (uncommitted) transaction."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(self._upsert_sql(), self._row(case_study, COMMITTED))
+        finally:
+            cursor.close()
+
+    def finish(self):
+        """Mark the run completed and close the ledger connection."""
+        with self._lock:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(
+                    "UPDATE ingestion_runs SET status = 'completed', finished_at = CURRENT_TIMESTAMP WHERE id = %s",
+                    (self.run_id,)
+                )
+                self.conn.commit()
+            finally:
+                cursor.close()
+        self.close()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,73 @@
+import os
+import logging
+import threading
+from typing import Dict, List
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from src.data.constants import CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Options selected per category when extracting categories from a query, as the LLM prompt asks for
+CATEGORY_TOP_K = int(os.getenv("CATEGORY_TOP_K", "3"))
+
+
+def label_to_text(category: str, label: str) -> str:
+    """Text embedded for a category option, e.g. 'key challenges: Market Entry'."""
+    return f"{category.replace('_', ' ')}: {label}"
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class LabelEmbeddings:
+    """
+    Normalized embeddings of every CATEGORIES option, embedded in one request.
+
+    Shared by the ingest-time EmbeddingClassifier (documents) and query-time category
+    extraction (user input), so both compare against the same label vectors.
+    """
+
+    def __init__(self, embedding_model: Embeddings, categories: Dict[str, List[str]] = CATEGORIES):
+        self.categories = categories
+        texts = [label_to_text(category, option) for category, options in categories.items() for option in options]
+        vectors = normalize_rows(np.asarray(embedding_model.embed_documents(texts), dtype=np.float32))
+        self.labels: Dict[str, np.ndarray] = {}
+        start = 0
+        for category, options in categories.items():
+            self.labels[category] = vectors[start:start + len(options)]
+            start += len(options)
+
+    def scores(self, vectors) -> Dict[str, np.ndarray]:
+        """
+        Per category, each option's cosine similarity to one vector, or its best
+        similarity to any of several (e.g. the pieces of a long text).
+        """
+        pieces = normalize_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        return {category: (pieces @ matrix.T).max(axis=0) for category, matrix in self.labels.items()}
+
+    def top_options(self, vectors, top_k: int = CATEGORY_TOP_K) -> Dict[str, List[str]]:
+        """The top_k options per category, best first."""
+        categories = {}
+        for category, scores in self.scores(vectors).items():
+            best = np.argsort(-scores, kind="stable")[:top_k]
+            categories[category] = [self.categories[category][i] for i in best]
+        return categories
+
+
+_label_embeddings: Dict[str, LabelEmbeddings] = {}
+_label_embeddings_lock = threading.Lock()
+
+
+def get_label_embeddings(embedding_model: Embeddings, model_name: str) -> LabelEmbeddings:
+    """Return the label embeddings for an embedding model ('provider/model'), computing them on first use."""
+    with _label_embeddings_lock:
+        if model_name not in _label_embeddings:
+            logger.info(f"Embedding category labels with {model_name}...")
+            _label_embeddings[model_name] = LabelEmbeddings(embedding_model)
+        return _label_embeddings[model_name]
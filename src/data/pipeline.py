@@ -0,0 +1,315 @@
+import os
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.data.db import connect_to_db
+from src.data.data_loader import (
+    CLASSIFY_DOC_BATCH_SIZE,
+    setup_classifiers,
+    get_text_splitter,
+    list_case_study_files,
+    parse_case_study,
+    get_ingested_case_studies,
+    get_chunk_embeddings_by_hash,
+    needs_processing,
+    apply_dedup,
+    classify_case_studies,
+    embed_case_study,
+    write_case_study,
+)
+from src.data.bulk_load import BulkLoader
+from src.data.ingest_ledger import IngestionLedger, PARSED, CLASSIFIED, EMBEDDED
+from src.data.dedup import DEDUP_ENABLED, NearDuplicateDetector
+from src.data.embedding_versions import get_active_version, is_base_version
+from src.data.vector_indexes import ensure_vector_indexes
+
+logger = logging.getLogger(__name__)
+
+# Default pool sizes and queue depth for the staged pipeline
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", "2"))
+CLASSIFY_WORKERS = int(os.getenv("INGEST_CLASSIFY_WORKERS", "1"))
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "4"))
+WRITE_WORKERS = int(os.getenv("INGEST_WRITE_WORKERS", "2"))
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "32"))
+# Seconds the classifier waits to fill a batch before running a partial one
+CLASSIFY_BATCH_WAIT = float(os.getenv("INGEST_CLASSIFY_BATCH_WAIT", "0.5"))
+
+_STOP = object()
+
+
+@dataclass
+class StageStats:
+    """Counters and timings for a single pipeline stage."""
+    name: str
+    workers: int
+    processed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, count: int, elapsed: float, failed: bool = False):
+        with self._lock:
+            if failed:
+                self.failed += count
+            else:
+                self.processed += count
+            self.busy_seconds += elapsed
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.processed / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wall_seconds": round(self.wall_seconds, 3),
+            "docs_per_sec": round(self.docs_per_sec, 3),
+        }
+
+
+class Stage:
+    """
+    A bounded pool of worker threads reading from one queue and writing to the next.
+
+    `fn` receives a list of items (of length 1 unless `batch_size` > 1) and returns a
+    list of outputs to forward downstream. Failures are logged, passed to `on_error`
+    if given, and the items dropped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[List[Any]], List[Any]],
+        workers: int,
+        in_queue: queue.Queue,
+        out_queue: Optional[queue.Queue] = None,
+        batch_size: int = 1,
+        batch_wait: float = 0.0,
+        on_error: Optional[Callable[[List[Any], Exception], None]] = None,
+    ):
+        self.name = name
+        self.on_error = on_error
+        self.fn = fn
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.stats = StageStats(name=name, workers=workers)
+        self.threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        self.stats.started_at = time.perf_counter()
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """Signal every worker to exit once the queue drains and wait for them."""
+        for _ in self.threads:
+            self.in_queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+        self.stats.finished_at = time.perf_counter()
+
+    def _next_batch(self) -> Tuple[List[Any], bool]:
+        item = self.in_queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.perf_counter() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = self.in_queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _worker(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                outputs = self.fn(batch)
+            except Exception as e:
+                self.stats.record(len(batch), time.perf_counter() - start, failed=True)
+                names = ", ".join(str(item.get("source_file", item)) if isinstance(item, dict) else str(item) for item in batch)
+                logger.error(f"[{self.name}] Error processing {names}: {e}")
+                if self.on_error is not None:
+                    self.on_error(batch, e)
+                continue
+            self.stats.record(len(batch), time.perf_counter() - start)
+            if self.out_queue is not None:
+                for output in outputs:
+                    self.out_queue.put(output)
+
+
+def process_case_studies_pipelined(
+    directory_path: str,
+    parse_workers: int = PARSE_WORKERS,
+    classify_workers: int = CLASSIFY_WORKERS,
+    embed_workers: int = EMBED_WORKERS,
+    write_workers: int = WRITE_WORKERS,
+    queue_size: int = QUEUE_SIZE,
+    classify_batch_size: int = CLASSIFY_DOC_BATCH_SIZE,
+    force: bool = False,
+    bulk: bool = False,
+    resume: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Ingest case studies through a staged pipeline so the classifier, the embedding
+    server and Postgres work concurrently.
+
+    Stages: parse -> classify (batched) -> chunk+embed -> write, connected by bounded
+    queues. Files with an unchanged content hash are dropped at the parse stage unless
+    `force` is set. With `bulk`, a single writer stages rows for binary COPY.
+    Per-file progress is checkpointed in an ingestion run ledger, which `resume`
+    (a run id or 'latest') continues from. Returns the per-stage throughput stats,
+    which are also logged.
+    """
+    # Embed with, and write to, the embedding version retrieval currently reads
+    version = get_active_version(refresh=True)
+    if bulk and not is_base_version(version):
+        logger.warning(f"Bulk loading only supports the base embedding version; writing version {version['id']} per document")
+        bulk = False
+    classifier, embedding_model = setup_classifiers(version=version)
+    text_splitter = get_text_splitter()
+
+    # One connection per worker thread; psycopg2 connections are not safe to share
+    thread_conns = threading.local()
+    opened_conns = []
+    conns_lock = threading.Lock()
+
+    def get_conn():
+        if not hasattr(thread_conns, "conn"):
+            thread_conns.conn = connect_to_db()
+            with conns_lock:
+                opened_conns.append(thread_conns.conn)
+        return thread_conns.conn
+
+    ingested = get_ingested_case_studies(get_conn())
+    ledger = IngestionLedger.start(str(directory_path), resume)
+    detector = NearDuplicateDetector() if DEDUP_ENABLED else None
+
+    def parse_stage(paths):
+        case_study = parse_case_study(paths[0])
+        if not needs_processing(case_study, ingested, force) or ledger.restore(case_study):
+            return []
+        if detector is not None and not apply_dedup(get_conn(), detector, case_study):
+            return []
+        ledger.mark([case_study], PARSED)
+        return [case_study]
+
+    def classify_stage(case_studies):
+        classify_case_studies(classifier, case_studies)
+        ledger.mark([cs for cs in case_studies if "metadata" in cs], CLASSIFIED)
+        return case_studies
+
+    def embed_stage(case_studies):
+        case_study = case_studies[0]
+        existing = get_chunk_embeddings_by_hash(get_conn(), case_study["id"], version) if case_study.get("id") else {}
+        embed_case_study(case_study, text_splitter, embedding_model, existing, classifier, detector)
+        ledger.mark([case_study], EMBEDDED)
+        return [case_study]
+
+    bulk_loader = None
+    if bulk:
+        # BulkLoader batches on one connection, so writes go through a single worker
+        write_workers = 1
+        bulk_loader = BulkLoader(connect_to_db(), ledger=ledger,
+                                 on_flush=detector.record_chunks if detector else None, full_load=force)
+        opened_conns.append(bulk_loader.conn)
+
+    def write_stage(case_studies):
+        case_study = case_studies[0]
+        if bulk_loader is not None:
+            bulk_loader.add(case_study)
+        else:
+            write_case_study(get_conn(), case_study, ledger, version)
+            if detector is not None:
+                detector.record_chunks(case_study)
+            logger.info(f"Successfully processed case study: {case_study['title']}")
+        return []
+
+    def record_failure(batch, error):
+        for item in batch:
+            if isinstance(item, dict):
+                ledger.mark_failed(item, error)
+
+    parse_q = queue.Queue(maxsize=queue_size)
+    classify_q = queue.Queue(maxsize=queue_size)
+    embed_q = queue.Queue(maxsize=queue_size)
+    write_q = queue.Queue(maxsize=queue_size)
+
+    stages = [
+        Stage("parse", parse_stage, parse_workers, parse_q, classify_q),
+        Stage("classify", classify_stage, classify_workers, classify_q, embed_q,
+              batch_size=classify_batch_size, batch_wait=CLASSIFY_BATCH_WAIT, on_error=record_failure),
+        Stage("embed", embed_stage, embed_workers, embed_q, write_q, on_error=record_failure),
+        Stage("write", write_stage, write_workers, write_q, on_error=record_failure),
+    ]
+
+    file_paths = list_case_study_files(directory_path)
+    logger.info(f"Found {len(file_paths)} text files to process")
+
+    start = time.perf_counter()
+    try:
+        for stage in stages:
+            stage.start()
+        for file_path in file_paths:
+            parse_q.put(file_path)
+        # Drain stages in order so each sees its upstream finish before stopping
+        for stage in stages:
+            stage.stop()
+        if bulk_loader is not None:
+            try:
+                bulk_loader.close()
+            except Exception as e:
+                # The batch was marked failed in the ledger; finish the run so it can be inspected
+                logger.error(f"Error writing the last bulk load batch: {e}")
+        if detector is not None:
+            detector.save()
+        ledger.finish()
+        # Build vector indexes missing after a first load
+        ensure_vector_indexes(get_conn(), version)
+    finally:
+        if bulk_loader is not None:
+            # Rebuild vector indexes dropped for a load that stopped early
+            bulk_loader.close(flush_pending=False)
+        ledger.close()
+        for conn in opened_conns:
+            conn.close()
+
+    elapsed = time.perf_counter() - start
+    report = [stage.stats.as_dict() for stage in stages]
+    for row in report:
+        logger.info(
+            f"[{row['stage']}] workers={row['workers']} processed={row['processed']} "
+            f"failed={row['failed']} busy={row['busy_seconds']}s docs/sec={row['docs_per_sec']}"
+        )
+    written = stages[-1].stats.processed
+    logger.info(f"Pipeline ingested {written} case studies in {elapsed:.1f}s "
+                f"({written / elapsed if elapsed > 0 else 0.0:.2f} docs/sec)")
+    return report
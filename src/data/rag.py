@@ -7,42 +7,54 @@ from langchain.chains import LLMChain
 from langchain_core.language_models import BaseChatModel
 from langchain_openai import ChatOpenAI
 from langchain_ollama import ChatOllama
-import psycopg2
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+import numpy as np
 from psycopg2.extras import RealDictCursor
-from pgvector.psycopg2 import register_vector
 import regex as re
 from dotenv import load_dotenv
+from src.data.category_cache import get_category_cache
+from src.data.label_embeddings import get_label_embeddings
 from src.data.constants import CATEGORIES
+from src.data.db import dbname, get_pool, host, password, pooled_connection, port, user
+from src.data.embedding_service import get_embedding_service
+from src.data.case_study_store import load_passages
+from src.data.embedding_versions import get_active_version
+from src.data.rerank import RERANK_BUDGET_MS, RERANK_ENABLED, RERANK_OVERFETCH
+from src.data.vector_indexes import apply_search_settings, describe_index, nearest_neighbours_sql, rerank_candidates, widening_search
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 load_dotenv()
 
-# Database connection parameters
-host = os.getenv("POSTGRES_HOST")
-port = os.getenv("POSTGRES_PORT")
-dbname = os.getenv("POSTGRES_DB")
-user = os.getenv("POSTGRES_USER")
-password = os.getenv("POSTGRES_PASSWORD")
 # Model Settings
 model_provider = os.getenv("MODEL_PROVIDER", "ollama")  # 'ollama' or 'openai'
 llm_model = os.getenv("LLM_MODEL", "Gemma3")  # Default for ollama
 embedding_model = os.getenv("EMBEDDING_MODEL", "mxbai-embed-large")  # Default embedding model
+# Retrieval Settings
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "category")  # 'category' (whole case studies), 'chunk' or 'hybrid' (relevant passages)
+CATEGORY_EXTRACTOR = os.getenv("CATEGORY_EXTRACTOR", "llm")  # 'llm' or 'embedding' (local label similarity)
+CHUNK_TOP_K = int(os.getenv("CHUNK_TOP_K", "20"))  # chunks retrieved before grouping by case study
+# Hybrid search: reciprocal rank fusion constant and number of query terms for the lexical side
+RRF_K = int(os.getenv("RRF_K", "60"))
+LEXICAL_MAX_TERMS = int(os.getenv("LEXICAL_MAX_TERMS", "32"))
+# Long uploads are embedded in pieces and averaged into one query vector
+QUERY_CHUNK_SIZE = 1000
+QUERY_MAX_CHUNKS = int(os.getenv("QUERY_MAX_CHUNKS", "16"))
 
 def get_db_connection_string():
     """Create a database connection string for SQLAlchemy."""
     return f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{dbname}"
 
-def get_embedding_model():
-    """Initialize embedding model based on environment settings."""
-    embeddings = None
-    
-    from langchain_ollama import OllamaEmbeddings
-    
-    embeddings = OllamaEmbeddings(
-        model=embedding_model
-    )
+def get_embedding_model(version: Optional[Dict[str, Any]] = None):
+    """Return the shared embedding service for an embedding version (default: environment settings)."""
+    if version is not None:
+        return get_embedding_service(version["provider"], version["model"])
+    return get_embedding_service()
 
-    return embeddings
+def llm_model_name() -> str:
+    """Provider and model of the LLM get_llm() returns, e.g. 'ollama/Gemma3'."""
+    if model_provider.lower() == "openai":
+        return f"openai/{os.getenv('LLM_MODEL', 'gpt-4')}"
+    return f"ollama/{llm_model}"
 
 def get_llm():
     """Initialize LLM model based on environment settings."""
@@ -61,51 +73,78 @@ def get_llm():
 
     return llm
 
+CATEGORY_PROMPT = ChatPromptTemplate.from_template("""
+Analyze the following business description and identify the most relevant categories that apply.
+For each category, select up to 3 most relevant options.
+
+Business Description:
+{business_description}
+
+Available categories and options:
+- Industry: {industry_options}
+- Company Size: {company_size_options}
+- Business Model: {business_model_options}
+- Growth Stage: {growth_stage_options}
+- Key Challenges: {key_challenges_options}
+- Core Strategies: {core_strategies_options}
+
+Respond with a JSON with category names as keys and lists of selected options as values.
+Format: 
+{{
+  "industry": ["option1", "option2"],
+  "company_size": ["option1"],
+  "business_model": ["option1", "option2"],
+  "growth_stage": ["option1"],
+  "key_challenges": ["option1", "option2", "option3"],
+  "core_strategies": ["option1", "option2", "option3"]
+}}
+
+Make sure all selected options match exactly from the provided lists.
+""")
+
+_category_chain = None
+
+def get_category_chain() -> LLMChain:
+    """Return the category extraction chain, building the LLM client on first use."""
+    global _category_chain
+    if _category_chain is None:
+        _category_chain = LLMChain(llm=get_llm(), prompt=CATEGORY_PROMPT)
+    return _category_chain
+
+def extract_categories_by_embedding(customer_input: str) -> Dict[str, List[str]]:
+    """
+    Pick business categories without an LLM: the input is embedded once (in pieces if
+    long) with the active embedding model and the closest CATEGORIES options taken.
+    """
+    version = get_active_version()
+    embedding_model = get_embedding_model(version)
+    label_embeddings = get_label_embeddings(embedding_model, f"{version['provider']}/{version['model']}")
+    return label_embeddings.top_options(embed_text_pieces(customer_input, embedding_model))
+
 def extract_business_categories(
     customer_input: str, 
+    extractor: Optional[str] = None,
 ) -> Dict[str, List[str]]:
     """
     Analyze customer input and extract relevant business categories
-    using LangChain and an LLM.
+    using LangChain and an LLM, or by embedding similarity to the category
+    options when the extractor (default CATEGORY_EXTRACTOR) is 'embedding'.
+
+    LLM results are cached on disk per (normalized input, LLM model, CATEGORIES
+    version), so repeat analyses of the same documents skip the LLM.
     """
-    # Implementation remains the same as before
-    llm = get_llm()
-    
-    # Create a prompt for analyzing the customer input
-    category_prompt = ChatPromptTemplate.from_template("""
-    Analyze the following business description and identify the most relevant categories that apply.
-    For each category, select up to 3 most relevant options.
-    
-    Business Description:
-    {business_description}
-    
-    Available categories and options:
-    - Industry: {industry_options}
-    - Company Size: {company_size_options}
-    - Business Model: {business_model_options}
-    - Growth Stage: {growth_stage_options}
-    - Key Challenges: {key_challenges_options}
-    - Core Strategies: {core_strategies_options}
-    
-    Respond with a JSON with category names as keys and lists of selected options as values.
-    Format: 
-    {{
-      "industry": ["option1", "option2"],
-      "company_size": ["option1"],
-      "business_model": ["option1", "option2"],
-      "growth_stage": ["option1"],
-      "key_challenges": ["option1", "option2", "option3"],
-      "core_strategies": ["option1", "option2", "option3"]
-    }}
-    
-    Make sure all selected options match exactly from the provided lists.
-    """)
-    
-    # Create the chain
-    chain = LLMChain(llm=llm, prompt=category_prompt)
-    
+    if (extractor or CATEGORY_EXTRACTOR).lower() == "embedding":
+        return extract_categories_by_embedding(customer_input)
+
+    cache = get_category_cache()
+    model_key = llm_model_name()
+    if cache is not None:
+        cached = cache.get(model_key, customer_input)
+        if cached is not None:
+            return cached
+
     # Run the chain
-    result = chain.invoke({
+    result = get_category_chain().invoke({
         "business_description": customer_input,
         "industry_options": ", ".join(CATEGORIES["industry"]),
         "company_size_options": ", ".join(CATEGORIES["company_size"]),
@@ -118,15 +157,20 @@ def extract_business_categories(
     # Parse the JSON result - with proper error handling
     try:
         categories = extract_json_from_text(result["text"])
+        if categories is None:
+            raise json.JSONDecodeError("No JSON object in LLM response", result["text"], 0)
         # Validate that all returned values are in our predefined categories
         for category, values in categories.items():
             if category in CATEGORIES:
                 categories[category] = [v for v in values if v in CATEGORIES[category]]
-        return categories
     except json.JSONDecodeError:
-        # Fallback in case of parsing errors
+        # Fallback in case of parsing errors; not cached, so the next request retries
         return {k: [] for k in CATEGORIES.keys()}
 
+    if cache is not None:
+        cache.put(model_key, customer_input, categories)
+    return categories
+
 def extract_json_from_text(text):
     """Extract JSON from text using regular expressions."""
     try:
@@ -167,28 +211,32 @@ def category_based_similarity_search(
         similarity_threshold: Minimum similarity score (0-1) to include in results
         
     Returns:
-        List of case studies with similarity scores
+        List of case studies with similarity scores. Their `content` is not selected;
+        load it on demand with case_study_store.with_bodies (cached by `content_hash`)
     """
-    # Get embedding model
-    embedding_model = get_embedding_model()
+    # Embed and search with the same (active) embedding version
+    version = get_active_version()
+    embedding_model = get_embedding_model(version)
     
     # Generate embedding for the input categories
     categories_text = categories_to_text(categories)
     query_embedding = embedding_model.embed_query(categories_text)
     
-    # Connect to database
-    conn = psycopg2.connect(
-        host=host,
-        port=port,
-        dbname=dbname,
-        user=user,
-        password=password
-    )
-    register_vector(conn)
+    # Check a connection out of the shared pool (pgvector types are already registered)
+    pool = get_pool()
+    conn = pool.getconn()
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
-    # Query similar case studies using vector similarity
-    query = """
+    # Half-precision or binary-quantized indexes are searched first and their candidates
+    # re-ranked exactly against the full-precision vectors
+    table = version["category_table"]
+    index = describe_index(conn, table, "categories_embedding")
+    storage = index["storage"] if index else "full"
+    
+    # Take the nearest candidates by distance (an index scan) and apply the threshold
+    # afterwards; filtering on the distance itself would force a sequential scan
+    query = f"""
+    WITH {nearest_neighbours_sql(table, "categories_embedding", "case_study_id", storage, version["dim"])}
     SELECT 
         cs.id,
         cs.title,
@@ -200,34 +248,34 @@ def category_based_similarity_search(
         cs.growth_stage,
         cs.key_challenges,
         cs.core_strategies,
-        cs.content,
-        1 - (csce.categories_embedding <=> %s::vector) as similarity_score
+        cs.content_hash,
+        1 - n.distance as similarity_score,
+        n.candidate_count
     FROM 
-        case_study_category_embeddings csce
+        (SELECT case_study_id, distance, count(*) OVER () AS candidate_count FROM nearest) n
     JOIN 
-        case_studies cs ON cs.id = csce.case_study_id
+        case_studies cs ON cs.id = n.case_study_id
     WHERE 
-        1 - (csce.categories_embedding <=> %s::vector) > %s
+        n.distance < %s
     ORDER BY 
-        similarity_score DESC
+        n.distance
     LIMIT %s
     """
     
+    def run(candidates: int) -> List[Dict[str, Any]]:
+        cursor.execute(query, (query_embedding, candidates, 1 - similarity_threshold, limit))
+        return cursor.fetchall()
+    
     try:
-        cursor.execute(query, (
-            query_embedding,
-            query_embedding,
-            similarity_threshold,
-            limit
-        ))
-        
-        results = cursor.fetchall()
+        # ivfflat.probes / hnsw.ef_search are sized for the recall target and candidate count
+        results = widening_search(conn, run, table, "categories_embedding", storage, limit)
         
         # Convert results to list of dictionaries
         case_studies = []
         for row in results:
             # Convert from RealDictRow to plain dict
             case_study = dict(row)
+            case_study.pop('candidate_count', None)
             # Round similarity score for readability
             case_study['similarity_score'] = round(case_study['similarity_score'], 4)
             case_studies.append(case_study)
@@ -240,7 +288,7 @@ def category_based_similarity_search(
     
     finally:
         cursor.close()
-        conn.close()
+        pool.putconn(conn)
 
 def query_relevant_case_studies(
     categories: Dict[str, List[str]],
@@ -255,7 +303,7 @@ def query_relevant_case_studies(
         limit: Maximum number of results to return
         
     Returns:
-        List of relevant case studies
+        List of relevant case studies, without their `content`
     """
     # First, try vector similarity search
     similar_case_studies = category_based_similarity_search(
@@ -294,6 +342,7 @@ def query_relevant_case_studies(
     SELECT 
         id, 
         title, 
+        source_url,
         summary,
         industry, 
         company_size, 
@@ -301,7 +350,7 @@ def query_relevant_case_studies(
         growth_stage, 
         key_challenges, 
         core_strategies,
-        content
+        content_hash
     FROM 
         case_studies
     WHERE 
@@ -309,25 +358,18 @@ def query_relevant_case_studies(
     LIMIT {limit - len(similar_case_studies)}
     """
 
-    # Connect directly with psycopg2 to get more structured results
-    conn = psycopg2.connect(
-        host=host,
-        port=port,
-        dbname=dbname,
-        user=user,
-        password=password
-    )
-    with conn.cursor() as cursor:
-        cursor.execute(sql_query)
-        columns = [desc[0] for desc in cursor.description]
-        for row in cursor.fetchall():
-            case_study = {}
-            for i, value in enumerate(row):
-                case_study[columns[i]] = value
-            # Add a dummy similarity score for consistency
-            case_study['similarity_score'] = 0.0
-            case_studies.append(case_study)
-    conn.close()
+    # Use a pooled psycopg2 connection to get more structured results
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql_query)
+            columns = [desc[0] for desc in cursor.description]
+            for row in cursor.fetchall():
+                case_study = {}
+                for i, value in enumerate(row):
+                    case_study[columns[i]] = value
+                # Add a dummy similarity score for consistency
+                case_study['similarity_score'] = 0.0
+                case_studies.append(case_study)
     
     # Combine results from both methods, ensuring no duplicates
     all_studies = similar_case_studies.copy()
@@ -342,6 +384,279 @@ def query_relevant_case_studies(
     
     return all_studies
 
-def get_rich_case_studies(customer_input: str,):
-    categories = extract_business_categories(customer_input,)
-    return query_relevant_case_studies(categories)
+def embed_text_pieces(text: str, embedding_model) -> np.ndarray:
+    """Embed text as normalized vectors of up to QUERY_MAX_CHUNKS pieces, in one request."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=QUERY_CHUNK_SIZE, chunk_overlap=0)
+    pieces = splitter.split_text(text)[:QUERY_MAX_CHUNKS] or [text]
+    vectors = np.asarray(embedding_model.embed_documents(pieces), dtype=np.float32)
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+def embed_query_text(text: str, embedding_model) -> List[float]:
+    """
+    Embed a user's text or question as one query vector. Text longer than the
+    embedding model's context is split and the normalized piece embeddings averaged.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=QUERY_CHUNK_SIZE, chunk_overlap=0)
+    pieces = splitter.split_text(text)[:QUERY_MAX_CHUNKS] or [text]
+    if len(pieces) == 1:
+        return embedding_model.embed_query(pieces[0])
+    return embed_text_pieces(text, embedding_model).mean(axis=0).tolist()
+
+def chunk_based_similarity_search(
+    text: str,
+    limit: int = 5,
+    top_k: int = CHUNK_TOP_K,
+    similarity_threshold: float = 0.5
+) -> List[Dict[str, Any]]:
+    """
+    Find the passages most relevant to the user's text using the chunk embeddings.
+    
+    The top_k nearest chunks are grouped by case study; the `limit` case studies with
+    the best matching chunk are returned, each with its matching passages (in document
+    order) instead of the full content. Passage texts are loaded afterwards, for the
+    returned case studies only, through the in-process chunk cache.
+    
+    Args:
+        text: The user's uploaded text or question
+        limit: Maximum number of case studies to return
+        top_k: Number of chunks to retrieve before grouping
+        similarity_threshold: Minimum similarity score (0-1) for a chunk to be included
+        
+    Returns:
+        List of case studies with `passages` and the best chunk's similarity score
+    """
+    # Embed and search with the same (active) embedding version
+    version = get_active_version()
+    query_embedding = embed_query_text(text, get_embedding_model(version))
+    
+    pool = get_pool()
+    conn = pool.getconn()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    
+    table = version["chunk_table"]
+    index = describe_index(conn, table, "embedding")
+    storage = index["storage"] if index else "full"
+    
+    # Nearest chunks by distance (an index scan), threshold applied afterwards
+    query = f"""
+    WITH {nearest_neighbours_sql(table, "embedding", "case_study_id", storage, version["dim"], "chunk_number")}
+    SELECT 
+        n.case_study_id,
+        n.chunk_number,
+        c.content_hash,
+        cs.title,
+        cs.source_url,
+        1 - n.distance as similarity_score,
+        n.candidate_count
+    FROM 
+        (SELECT case_study_id, chunk_number, distance, count(*) OVER () AS candidate_count FROM nearest) n
+    JOIN 
+        case_studies cs ON cs.id = n.case_study_id
+    JOIN 
+        case_study_chunks c ON c.case_study_id = n.case_study_id AND c.chunk_number = n.chunk_number
+    WHERE 
+        n.distance < %s
+    ORDER BY 
+        n.distance
+    LIMIT %s
+    """
+    
+    def run(candidates: int) -> List[Dict[str, Any]]:
+        cursor.execute(query, (query_embedding, candidates, 1 - similarity_threshold, top_k))
+        return cursor.fetchall()
+    
+    try:
+        rows = widening_search(conn, run, table, "embedding", storage, top_k)
+    except Exception as e:
+        print(f"Error querying similar chunks: {e}")
+        return []
+    finally:
+        cursor.close()
+        pool.putconn(conn)
+    
+    # Group chunks by case study, ordered by each case study's best chunk
+    case_studies: Dict[int, Dict[str, Any]] = {}
+    for row in rows:
+        case_study = case_studies.get(row["case_study_id"])
+        if case_study is None:
+            if len(case_studies) >= limit:
+                continue
+            case_study = case_studies[row["case_study_id"]] = {
+                "id": row["case_study_id"],
+                "title": row["title"],
+                "source_url": row["source_url"],
+                "similarity_score": round(row["similarity_score"], 4),
+                "passages": [],
+            }
+        case_study["passages"].append({
+            "chunk_number": row["chunk_number"],
+            "content_hash": row["content_hash"],
+            "similarity_score": round(row["similarity_score"], 4),
+        })
+    for case_study in case_studies.values():
+        case_study["passages"].sort(key=lambda passage: passage["chunk_number"])
+    # Only the passages of the case studies kept are loaded
+    return load_passages(list(case_studies.values()))
+
+def hybrid_search(
+    text: str,
+    limit: int = 5,
+    top_k: int = CHUNK_TOP_K
+) -> List[Dict[str, Any]]:
+    """
+    Find case studies for the user's text by fusing vector and full-text rankings.
+    
+    Three rankings are computed in one statement (one round trip): nearest chunks by
+    embedding, chunks by full-text match, and case studies by full-text match on title
+    and content (which catches shared company names, regions and product terms). They
+    are combined per case study with reciprocal rank fusion, sum(1 / (RRF_K + rank)),
+    using each case study's best-ranked chunk per list.
+    
+    The lexical query ORs the text's most frequent LEXICAL_MAX_TERMS stemmed terms,
+    since requiring every term of a long upload would match nothing.
+    
+    Returns:
+        List of case studies with `passages` (chunks found by either side) and
+        the fused `similarity_score`
+    """
+    version = get_active_version()
+    query_embedding = embed_query_text(text, get_embedding_model(version))
+    
+    pool = get_pool()
+    conn = pool.getconn()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    
+    table = version["chunk_table"]
+    index = describe_index(conn, table, "embedding")
+    storage = index["storage"] if index else "full"
+    candidates = rerank_candidates(storage, top_k)
+    
+    query = f"""
+    WITH {nearest_neighbours_sql(table, "embedding", "case_study_id", storage, version["dim"], "chunk_number")},
+    terms AS (
+        SELECT lexeme FROM unnest(to_tsvector('english', %s))
+        ORDER BY array_length(positions, 1) DESC NULLS LAST, lexeme
+        LIMIT %s
+    ),
+    lexical_query AS (
+        SELECT string_agg(quote_literal(lexeme), ' | ')::tsquery AS q FROM terms
+    ),
+    vector_hits AS (
+        SELECT case_study_id, chunk_number, row_number() OVER (ORDER BY distance) AS rank
+        FROM nearest
+        ORDER BY distance
+        LIMIT %s
+    ),
+    lexical_hits AS (
+        SELECT c.case_study_id, c.chunk_number,
+               row_number() OVER (ORDER BY ts_rank_cd(c.search_vector, lq.q) DESC) AS rank
+        FROM case_study_chunks c, lexical_query lq
+        WHERE c.search_vector @@ lq.q
+        ORDER BY rank
+        LIMIT %s
+    ),
+    document_hits AS (
+        SELECT cs.id AS case_study_id,
+               row_number() OVER (ORDER BY ts_rank_cd(cs.search_vector, lq.q) DESC) AS rank
+        FROM case_studies cs, lexical_query lq
+        WHERE cs.search_vector @@ lq.q
+        ORDER BY rank
+        LIMIT %s
+    ),
+    fused AS (
+        SELECT case_study_id, SUM(1.0 / (%s + rank)) AS score
+        FROM (
+            SELECT case_study_id, MIN(rank) AS rank FROM vector_hits GROUP BY case_study_id
+            UNION ALL
+            SELECT case_study_id, MIN(rank) AS rank FROM lexical_hits GROUP BY case_study_id
+            UNION ALL
+            SELECT case_study_id, rank FROM document_hits
+        ) ranks
+        GROUP BY case_study_id
+        ORDER BY score DESC
+        LIMIT %s
+    ),
+    passages AS (
+        SELECT case_study_id, chunk_number FROM vector_hits
+        UNION
+        SELECT case_study_id, chunk_number FROM lexical_hits
+    )
+    SELECT 
+        f.case_study_id,
+        f.score,
+        cs.title,
+        cs.source_url,
+        p.chunk_number,
+        c.content_hash
+    FROM 
+        fused f
+    JOIN 
+        case_studies cs ON cs.id = f.case_study_id
+    LEFT JOIN 
+        passages p ON p.case_study_id = f.case_study_id
+    LEFT JOIN 
+        case_study_chunks c ON c.case_study_id = p.case_study_id AND c.chunk_number = p.chunk_number
+    ORDER BY 
+        f.score DESC, p.chunk_number
+    """
+    
+    try:
+        apply_search_settings(conn, table, "embedding", candidates)
+        cursor.execute(query, (
+            query_embedding,
+            candidates,
+            text,
+            LEXICAL_MAX_TERMS,
+            top_k,
+            top_k,
+            top_k,
+            RRF_K,
+            limit
+        ))
+        rows = cursor.fetchall()
+    except Exception as e:
+        print(f"Error in hybrid search: {e}")
+        return []
+    finally:
+        cursor.close()
+        pool.putconn(conn)
+    
+    # Rows arrive ordered by fused score, then chunk number within a case study
+    case_studies: Dict[int, Dict[str, Any]] = {}
+    for row in rows:
+        case_study = case_studies.setdefault(row["case_study_id"], {
+            "id": row["case_study_id"],
+            "title": row["title"],
+            "source_url": row["source_url"],
+            "similarity_score": round(float(row["score"]), 4),
+            "passages": [],
+        })
+        if row["chunk_number"] is not None:
+            case_study["passages"].append({"chunk_number": row["chunk_number"], "content_hash": row["content_hash"]})
+    return load_passages(list(case_studies.values()))
+
+def get_rich_case_studies(customer_input: str, mode: Optional[str] = None, limit: int = 5, rerank: Optional[bool] = None):
+    """
+    Retrieve case studies for the user's input: whole case studies matched on
+    extracted categories ('category'), or the relevant passages only, from vector
+    search ('chunk') or vector plus full-text search ('hybrid').
+
+    With re-ranking on (RERANK_ENABLED), RERANK_OVERFETCH times as many candidates are
+    retrieved and re-ordered by a cross-encoder scoring them against the input; if that
+    takes longer than RERANK_BUDGET_MS, the retrieval order is kept.
+    """
+    mode = (mode or RETRIEVAL_MODE).lower()
+    rerank = RERANK_ENABLED if rerank is None else rerank
+    fetch = limit * RERANK_OVERFETCH if rerank else limit
+    if mode == "hybrid":
+        case_studies = hybrid_search(customer_input, limit=fetch, top_k=max(CHUNK_TOP_K, fetch * 4))
+    elif mode == "chunk":
+        case_studies = chunk_based_similarity_search(customer_input, limit=fetch, top_k=max(CHUNK_TOP_K, fetch * 4))
+    else:
+        categories = extract_business_categories(customer_input,)
+        case_studies = query_relevant_case_studies(categories, limit=fetch)
+    if not rerank:
+        return case_studies
+    # Imported here so the app does not load torch and transformers unless re-ranking is on
+    from src.data.rerank import get_reranker
+    return get_reranker().rerank(customer_input, case_studies, limit, RERANK_BUDGET_MS)
@@ -0,0 +1,263 @@
+import os
+import argparse
+import json
+import logging
+from typing import Any, Dict, Optional
+import numpy as np
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+from src.data.db import connect_to_db, create_embedding_version_table
+from src.data.async_embeddings import get_async_embedding_client
+from src.data.embedding_service import resolve_embedding_model
+from src.data.data_loader import categories_to_text
+from src.data.embedding_versions import (
+    create_version_tables,
+    get_active_version,
+    get_version,
+    is_base_version,
+    list_versions,
+    upsert_category_embeddings,
+    upsert_chunk_embeddings,
+)
+from src.data.vector_indexes import build_vector_indexes
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+REEMBED_BATCH_SIZE = int(os.getenv("REEMBED_BATCH_SIZE", "256"))
+
+
+def find_or_create_version(conn, provider: str, model: str, embeddings) -> Dict[str, Any]:
+    """Return the latest version for a model, registering a new 'building' one if there is none."""
+    cursor = conn.cursor()
+    try:
+        create_embedding_version_table(cursor)
+        cursor.execute(
+            "SELECT id FROM embedding_versions WHERE provider = %s AND model = %s ORDER BY id DESC LIMIT 1",
+            (provider, model)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            dim = len(embeddings.embed_query("dimension probe"))
+            cursor.execute(
+                "INSERT INTO embedding_versions (provider, model, dim) VALUES (%s, %s, %s) RETURNING id",
+                (provider, model, dim)
+            )
+            row = cursor.fetchone()
+            logger.info(f"Registered embedding version {row[0]} for {provider}/{model} ({dim} dimensions)")
+        version = get_version(conn, row[0])
+        if not is_base_version(version):
+            create_version_tables(cursor, version)
+        conn.commit()
+        return version
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _missing_chunks_query(version: Dict[str, Any]) -> str:
+    if is_base_version(version):
+        return """
+        SELECT case_study_id, chunk_number, content, content_hash
+        FROM case_study_chunks
+        WHERE embedding IS NULL
+        ORDER BY case_study_id, chunk_number
+        LIMIT %s
+        """
+    # Missing, or embedded from an older version of the chunk text
+    return f"""
+    SELECT c.case_study_id, c.chunk_number, c.content, c.content_hash
+    FROM case_study_chunks c
+    LEFT JOIN {version["chunk_table"]} v USING (case_study_id, chunk_number)
+    WHERE v.case_study_id IS NULL OR v.content_hash IS DISTINCT FROM c.content_hash
+    ORDER BY c.case_study_id, c.chunk_number
+    LIMIT %s
+    """
+
+
+def _missing_categories_query(version: Dict[str, Any]) -> str:
+    if is_base_version(version):
+        return """
+        SELECT case_study_id, categories_json
+        FROM case_study_category_embeddings
+        WHERE categories_embedding IS NULL
+        ORDER BY case_study_id
+        LIMIT %s
+        """
+    return f"""
+    SELECT c.case_study_id, c.categories_json
+    FROM case_study_category_embeddings c
+    LEFT JOIN {version["category_table"]} v USING (case_study_id)
+    WHERE v.case_study_id IS NULL OR v.categories_json IS DISTINCT FROM c.categories_json
+    ORDER BY c.case_study_id
+    LIMIT %s
+    """
+
+
+def backfill_version(conn, version: Dict[str, Any], embeddings, batch_size: int = REEMBED_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Embed stored chunk texts and category sets that the version is missing (or has
+    stale vectors for), committing batch by batch so the job can be interrupted and
+    re-run. Returns the number of chunks and category sets embedded.
+    """
+    counts = {"chunks": 0, "categories": 0}
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute(_missing_chunks_query(version), (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            vectors = embeddings.embed_documents([row[2] for row in rows])
+            if is_base_version(version):
+                execute_values(cursor, """
+                UPDATE case_study_chunks c SET embedding = data.embedding
+                FROM (VALUES %s) AS data (case_study_id, chunk_number, embedding)
+                WHERE c.case_study_id = data.case_study_id AND c.chunk_number = data.chunk_number
+                """, [(row[0], row[1], np.asarray(vector)) for row, vector in zip(rows, vectors)],
+                    template="(%s, %s, %s::vector)")
+            else:
+                upsert_chunk_embeddings(cursor, version, [
+                    (row[0], row[1], row[3], np.asarray(vector)) for row, vector in zip(rows, vectors)
+                ])
+            conn.commit()
+            counts["chunks"] += len(rows)
+            logger.info(f"Version {version['id']}: embedded {counts['chunks']} chunks")
+
+        while True:
+            cursor.execute(_missing_categories_query(version), (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            vectors = embeddings.embed_documents([categories_to_text(row[1]) for row in rows])
+            if is_base_version(version):
+                execute_values(cursor, """
+                UPDATE case_study_category_embeddings c SET categories_embedding = data.embedding
+                FROM (VALUES %s) AS data (case_study_id, embedding)
+                WHERE c.case_study_id = data.case_study_id
+                """, [(row[0], np.asarray(vector)) for row, vector in zip(rows, vectors)],
+                    template="(%s, %s::vector)")
+            else:
+                upsert_category_embeddings(cursor, version, [
+                    (row[0], json.dumps(row[1]), np.asarray(vector)) for row, vector in zip(rows, vectors)
+                ])
+            conn.commit()
+            counts["categories"] += len(rows)
+        logger.info(f"Version {version['id']}: embedded {counts['categories']} category sets")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return counts
+
+
+def activate_version(conn, version_id: int):
+    """Atomically make a version the one retrieval reads, retiring the previous one."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("LOCK TABLE embedding_versions IN EXCLUSIVE MODE")
+        cursor.execute("UPDATE embedding_versions SET status = 'retired' WHERE status = 'active' AND id <> %s", (version_id,))
+        cursor.execute(
+            "UPDATE embedding_versions SET status = 'active', activated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            (version_id,)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    get_active_version(conn, refresh=True)
+    logger.info(f"Embedding version {version_id} is now active")
+
+
+def reembed(provider: Optional[str] = None, model: Optional[str] = None, batch_size: int = REEMBED_BATCH_SIZE, activate: bool = True) -> Dict[str, Any]:
+    """
+    Re-embed the corpus with another model without interrupting retrieval.
+
+    Fills the model's version from stored chunk text while the current version keeps
+    serving, builds its indexes, then flips the active version in one transaction and
+    runs a catch-up pass for documents ingested under the old version in the meantime.
+    Safe to re-run: it resumes where it stopped, and running it for the active model
+    fills any gaps (e.g. from a loader that was still writing the previous version).
+    """
+    provider, model = resolve_embedding_model(provider, model)
+    embeddings = get_async_embedding_client(provider, model)
+    conn = connect_to_db()
+    try:
+        version = find_or_create_version(conn, provider, model, embeddings)
+        logger.info(f"Re-embedding into version {version['id']} ({provider}/{model})")
+        counts = backfill_version(conn, version, embeddings, batch_size)
+        # Base version indexes survive the backfill; only new side tables need building
+        if not is_base_version(version):
+            build_vector_indexes(conn, version)
+        if activate and version["status"] != "active":
+            activate_version(conn, version["id"])
+            catch_up = backfill_version(conn, version, embeddings, batch_size)
+            counts = {key: counts[key] + catch_up[key] for key in counts}
+        return {"version": version["id"], **counts}
+    finally:
+        conn.close()
+
+
+def drop_version(version_id: int):
+    """Drop the tables of a retired, non-base version."""
+    conn = connect_to_db()
+    cursor = conn.cursor()
+    try:
+        version = get_version(conn, version_id)
+        if version is None or is_base_version(version) or version["status"] == "active":
+            raise ValueError(f"Version {version_id} cannot be dropped")
+        cursor.execute(f"DROP TABLE IF EXISTS {version['chunk_table']}")
+        cursor.execute(f"DROP TABLE IF EXISTS {version['category_table']}")
+        cursor.execute("DELETE FROM embedding_versions WHERE id = %s", (version_id,))
+        conn.commit()
+        logger.info(f"Dropped embedding version {version_id}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed the corpus into a new embedding version and switch to it.")
+    parser.add_argument("--provider", default=None, help="Embedding provider (default MODEL_PROVIDER)")
+    parser.add_argument("--model", default=None, help="Embedding model (default EMBEDDING_MODEL)")
+    parser.add_argument("--batch-size", type=int, default=REEMBED_BATCH_SIZE)
+    parser.add_argument("--no-activate", action="store_true", help="Fill the version but keep serving the current one")
+    parser.add_argument("--activate", type=int, default=None, metavar="VERSION_ID",
+                        help="Switch to an existing version (e.g. roll back), catching it up first")
+    parser.add_argument("--drop", type=int, default=None, metavar="VERSION_ID", help="Drop a retired version's tables")
+    parser.add_argument("--status", action="store_true", help="List embedding versions")
+    args = parser.parse_args()
+
+    if args.status:
+        conn = connect_to_db()
+        try:
+            for version in list_versions(conn):
+                logger.info(f"{version['id']}: {version['provider']}/{version['model']} dim={version['dim']} {version['status']}")
+        finally:
+            conn.close()
+    elif args.drop is not None:
+        drop_version(args.drop)
+    elif args.activate is not None:
+        conn = connect_to_db()
+        try:
+            version = get_version(conn, args.activate)
+        finally:
+            conn.close()
+        if version is None:
+            raise SystemExit(f"Unknown embedding version {args.activate}")
+        logger.info(reembed(version["provider"], version["model"], args.batch_size))
+    else:
+        logger.info(reembed(args.provider, args.model, args.batch_size, activate=not args.no_activate))
+
+
+if __name__ == "__main__":
+    main()
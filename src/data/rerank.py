@@ -0,0 +1,154 @@
+import os
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from src.data.case_study_store import with_bodies
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Re-ranking Settings
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_OVERFETCH = int(os.getenv("RERANK_OVERFETCH", "3"))  # candidates retrieved per returned result
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))  # past this, the retrieval order is returned
+# Small batches let the budget stop scoring part-way through the candidates
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "4"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "512"))  # tokens per (query, passage) pair
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", "0"))  # 0 keeps the torch default
+# Characters of each case study scored against the query
+RERANK_PASSAGE_CHARS = 2000
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(" ".join(query.split()).encode("utf-8")).hexdigest()
+
+
+def passage_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def passage_text(case_study: Dict[str, Any]) -> str:
+    """What a case study is scored on: its matched passages, or its summary, or its content."""
+    if case_study.get("passages"):
+        text = "\n".join(passage["content"] for passage in case_study["passages"])
+    else:
+        text = case_study.get("summary") or case_study.get("content") or ""
+    title = case_study.get("title") or ""
+    return f"{title}. {text}"[:RERANK_PASSAGE_CHARS]
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, case study) pairs with a small cross-encoder on CPU.
+
+    Linear layers are dynamically quantized to int8, as for the 'quantized' classifier
+    backend. torch and transformers are imported here rather than at module level, so
+    importing the settings (as rag.py does) stays cheap when re-ranking is off. Scores are cached per (query hash, case study id, scored text hash) in an
+    LRU, so follow-up turns over the same upload cost nothing, while category results
+    (scored on summaries) and chunk results (scored on passages) never share scores.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, num_threads: int = RERANK_THREADS,
+                 batch_size: int = RERANK_BATCH_SIZE, cache_size: int = RERANK_CACHE_SIZE):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model.eval()
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, Any, str], float]" = OrderedDict()
+        # Duration of the latest scored batch, carried across calls so the budget can
+        # also stop the first batch of a call
+        self._batch_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def score_batch(self, query: str, passages: List[str]) -> List[float]:
+        import torch
+        inputs = self.tokenizer(
+            [query] * len(passages), passages,
+            padding=True, truncation=True, max_length=RERANK_MAX_LENGTH, return_tensors="pt"
+        )
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits
+        # Single-logit relevance models; otherwise use the 'relevant' class
+        return (logits[:, 0] if logits.shape[1] == 1 else logits[:, -1]).tolist()
+
+    def rerank(self, query: str, case_studies: List[Dict[str, Any]], top_k: int,
+               budget_ms: float = RERANK_BUDGET_MS) -> List[Dict[str, Any]]:
+        """
+        Return the top_k case studies by cross-encoder score, each with `rerank_score`.
+
+        The budget covers scoring only (bodies are loaded first). Candidates are scored
+        in small batches; when the next batch (timed as long as the latest one, also from
+        earlier calls) would end past `budget_ms`, the rest are skipped and the candidates are returned in their retrieval order.
+        """
+        if not case_studies:
+            return []
+        # Results with nothing else to score on are scored on their body
+        case_studies = with_bodies(case_studies, only_without_summary=True)
+        query_key = query_hash(query)
+        texts = [passage_text(case_study) for case_study in case_studies]
+        keys = [(query_key, case_study.get("id"), passage_hash(text)) for case_study, text in zip(case_studies, texts)]
+
+        scores: Dict[int, float] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    scores[i] = cached
+
+        missing = [i for i in range(len(case_studies)) if i not in scores]
+        start = time.perf_counter()
+        deadline = start + budget_ms / 1000.0
+        for offset in range(0, len(missing), self.batch_size):
+            now = time.perf_counter()
+            if now + self._batch_seconds > deadline:
+                logger.warning(
+                    f"Re-ranking would exceed its {budget_ms:.0f}ms budget after {(now - start) * 1000:.0f}ms; "
+                    f"keeping retrieval order"
+                )
+                return case_studies[:top_k]
+            batch = missing[offset:offset + self.batch_size]
+            batch_scores = self.score_batch(query, [texts[i] for i in batch])
+            self._batch_seconds = time.perf_counter() - now
+            with self._lock:
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = score
+                    self._cache[keys[i]] = score
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        order = np.argsort([-scores[i] for i in range(len(case_studies))], kind="stable")
+        reranked = []
+        for i in order[:top_k]:
+            case_study = dict(case_studies[i])
+            case_study["rerank_score"] = round(float(scores[i]), 4)
+            reranked.append(case_study)
+        return reranked
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Return the process-wide reranker, loading the model on first use."""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            logger.info(f"Loading cross-encoder {RERANK_MODEL} for re-ranking...")
+            _reranker = CrossEncoderReranker()
+        return _reranker
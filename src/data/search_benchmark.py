@@ -0,0 +1,167 @@
+import os
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+import numpy as np
+from src.config import REPORTS_DIR
+from src.data.db import connect_to_db, emb_size
+from src.data.vector_indexes import HNSW_EF_CONSTRUCTION, HNSW_M, apply_search_settings, index_ddl, nearest_neighbours_sql
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_DIR = REPORTS_DIR / "benchmarks"
+TABLE = "bench_similarity_vectors"
+
+# The form category_based_similarity_search used before: the distance is computed twice
+# and filtered in WHERE, which the planner cannot serve from the ANN index
+LEGACY_QUERY = f"""
+SELECT id, 1 - (embedding <=> %s::vector) AS similarity_score
+FROM {TABLE}
+WHERE 1 - (embedding <=> %s::vector) > %s
+ORDER BY similarity_score DESC
+LIMIT %s
+"""
+
+
+def index_friendly_query(storage: str, dim: int) -> str:
+    """The same search in the form rag.py uses now."""
+    return f"""
+    WITH {nearest_neighbours_sql(TABLE, "embedding", "id", storage, dim)}
+    SELECT id, 1 - distance AS similarity_score
+    FROM nearest
+    WHERE distance < %s
+    ORDER BY distance
+    LIMIT %s
+    """
+
+
+def create_vector_table(conn, rows: int, dim: int, method: str, storage: str) -> float:
+    """Fill a temporary table with random vectors and index it; returns the index build seconds."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"CREATE TEMP TABLE {TABLE} (id SERIAL PRIMARY KEY, embedding vector({dim}))")
+        # Referencing the outer row keeps Postgres from evaluating the vector only once
+        cursor.execute(f"""
+        INSERT INTO {TABLE} (embedding)
+        SELECT (SELECT array_agg(random() - 0.5) FROM generate_series(1, %s) WHERE g > 0)::vector
+        FROM generate_series(1, %s) g
+        """, (dim, rows))
+        start = time.perf_counter()
+        cursor.execute(index_ddl(f"idx_{TABLE}", TABLE, "embedding", method, rows, HNSW_M, HNSW_EF_CONSTRUCTION,
+                                 storage=storage, dim=dim))
+        seconds = time.perf_counter() - start
+        cursor.execute(f"ANALYZE {TABLE}")
+        conn.commit()
+        return seconds
+    finally:
+        cursor.close()
+
+
+def plan_node_types(plan: Dict[str, Any]) -> List[str]:
+    """All node types of an EXPLAIN (FORMAT JSON) plan, with the index name for index scans."""
+    node = plan["Node Type"] + (f" using {plan['Index Name']}" if "Index Name" in plan else "")
+    return [node] + [child for sub in plan.get("Plans", []) for child in plan_node_types(sub)]
+
+
+def explain(conn, query: str, params: tuple) -> List[str]:
+    cursor = conn.cursor()
+    try:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+        return plan_node_types(cursor.fetchone()[0][0]["Plan"])
+    finally:
+        cursor.close()
+
+
+def uses_index_scan(nodes: List[str]) -> bool:
+    return any(node.startswith("Index Scan") and f"idx_{TABLE}" in node for node in nodes)
+
+
+def time_queries(conn, query: str, param_sets: List[tuple], k: int) -> Dict[str, float]:
+    """Latency percentiles (ms) of running the query for each parameter set."""
+    timings = []
+    cursor = conn.cursor()
+    try:
+        for params in param_sets:
+            apply_search_settings(conn, TABLE, "embedding", k)
+            start = time.perf_counter()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+            conn.rollback()
+    finally:
+        cursor.close()
+    return {
+        "p50_ms": round(float(np.percentile(timings, 50)), 2),
+        "p95_ms": round(float(np.percentile(timings, 95)), 2),
+        "mean_ms": round(float(np.mean(timings)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that the category similarity query uses the ANN index and compare it with the legacy form."
+    )
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=emb_size)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--method", choices=["hnsw", "ivfflat"], default="hnsw")
+    parser.add_argument("--storage", choices=["full", "halfvec", "binary"], default="full")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON results path (default reports/benchmarks/search-<timestamp>.json)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vectors = [[rng.random() - 0.5 for _ in range(args.dim)] for _ in range(args.queries)]
+    new_query = index_friendly_query(args.storage, args.dim)
+    new_params = [(np.array(v), args.k, 1 - args.threshold, args.k) for v in vectors]
+    legacy_params = [(np.array(v), np.array(v), args.threshold, args.k) for v in vectors]
+
+    conn = connect_to_db()
+    try:
+        logger.info(f"Loading {args.rows} random {args.dim}-dimension vectors...")
+        build_seconds = create_vector_table(conn, args.rows, args.dim, args.method, args.storage)
+
+        apply_search_settings(conn, TABLE, "embedding", args.k)
+        new_plan = explain(conn, new_query, new_params[0])
+        conn.rollback()
+        legacy_plan = explain(conn, LEGACY_QUERY, legacy_params[0])
+        conn.rollback()
+
+        result = {
+            "rows": args.rows,
+            "index_build_seconds": round(build_seconds, 2),
+            "index_friendly": {"plan": new_plan, "index_scan": uses_index_scan(new_plan),
+                               **time_queries(conn, new_query, new_params, args.k)},
+            "legacy": {"plan": legacy_plan, "index_scan": uses_index_scan(legacy_plan),
+                       **time_queries(conn, LEGACY_QUERY, legacy_params, args.k)},
+        }
+    finally:
+        conn.close()
+
+    result["config"] = {key: value for key, value in vars(args).items() if key != "output"}
+    result["environment"] = {"python": platform.python_version(), "platform": platform.platform()}
+    result["timestamp"] = datetime.now().isoformat(timespec="seconds")
+
+    output = args.output or str(BENCHMARK_DIR / f"search-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(result, file, indent=2)
+    logger.info(f"Search benchmark results written to {output}")
+    logger.info(json.dumps({key: result[key] for key in ("index_friendly", "legacy")}, indent=2))
+
+    if not result["index_friendly"]["index_scan"]:
+        logger.error("The index-friendly query did not use the vector index")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
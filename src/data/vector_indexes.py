@@ -0,0 +1,385 @@
+import os
+import argparse
+import json
+import logging
+import math
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import psycopg2
+from dotenv import load_dotenv
+from src.data.db import VECTOR_INDEXES, connect_to_db, emb_size
+from src.data.embedding_versions import get_active_version, get_version, is_base_version
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Index Build Settings
+VECTOR_INDEX_METHOD = os.getenv("VECTOR_INDEX_METHOD", "hnsw")  # 'hnsw' or 'ivfflat'
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+INDEX_MAINTENANCE_WORK_MEM = os.getenv("INDEX_MAINTENANCE_WORK_MEM", "")  # e.g. '1GB'; empty keeps the server setting
+# What the index stores: 'full' (float32), 'halfvec' (float16, 2x smaller) or 'binary' (1 bit/dim, 32x smaller).
+# Tables keep full-precision vectors, which quantized searches re-rank against.
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "full")
+
+# Query Settings
+RECALL_TARGET = float(os.getenv("RECALL_TARGET", "0.95"))
+# Widest vectors pgvector can index per storage type
+MAX_INDEXED_DIM = {"full": 2000, "halfvec": 4000, "binary": 64000}
+# Candidates fetched per requested result from a quantized index before exact re-ranking
+HALFVEC_RERANK_FACTOR = int(os.getenv("HALFVEC_RERANK_FACTOR", "2"))
+BINARY_RERANK_FACTOR = int(os.getenv("BINARY_RERANK_FACTOR", "10"))
+# Times a search doubles its candidate count when too few results pass the threshold
+SEARCH_MAX_WIDENING = int(os.getenv("SEARCH_MAX_WIDENING", "3"))
+
+# (recall target, fraction of ivfflat lists to probe, hnsw ef_search); rules of thumb
+# for ~1k-dimension text embeddings, the first row at or above the target is used
+RECALL_SETTINGS = [
+    (0.80, 0.01, 20),
+    (0.90, 0.03, 40),
+    (0.95, 0.05, 80),
+    (0.98, 0.10, 160),
+    (0.99, 0.20, 300),
+]
+# Seconds index definitions are cached for per-query settings
+INDEX_INFO_TTL = 60.0
+
+_index_info: Dict[Tuple[str, str], Tuple[float, Optional[Dict[str, Any]]]] = {}
+_index_info_lock = threading.Lock()
+
+
+def index_targets(version: Optional[Dict[str, Any]] = None) -> List[Tuple[str, str, str]]:
+    """(index name, table, column) of the vector indexes of an embedding version."""
+    if is_base_version(version):
+        return [(name, table, column) for name, (table, column) in VECTOR_INDEXES.items()]
+    return [
+        (f"idx_{version['chunk_table']}_embedding", version["chunk_table"], "embedding"),
+        (f"idx_{version['category_table']}_embedding", version["category_table"], "categories_embedding"),
+    ]
+
+
+def ivfflat_lists(rows: int) -> int:
+    """pgvector's recommendation: rows / 1000 up to 1M rows, sqrt(rows) above."""
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def indexed_expression(column: str, storage: str = "full", dim: int = emb_size) -> Tuple[str, str]:
+    """(indexed expression, operator class) for a storage type."""
+    if storage == "halfvec":
+        return f"({column}::halfvec({dim}))", "halfvec_cosine_ops"
+    if storage == "binary":
+        return f"(binary_quantize({column})::bit({dim}))", "bit_hamming_ops"
+    if storage != "full":
+        raise ValueError(f"Unknown vector storage: {storage}")
+    return column, "vector_cosine_ops"
+
+
+def first_pass_distance(column: str, storage: str = "full", dim: int = emb_size, query_sql: str = "%s::vector") -> str:
+    """
+    Distance expression matching the index of a storage type, so ORDER BY it LIMIT n
+    is served by the index. `query_sql` is the SQL of the query vector.
+    """
+    if storage == "halfvec":
+        return f"{column}::halfvec({dim}) <=> ({query_sql})::halfvec({dim})"
+    if storage == "binary":
+        return f"binary_quantize({column})::bit({dim}) <~> binary_quantize({query_sql})::bit({dim})"
+    return f"{column} <=> {query_sql}"
+
+
+def nearest_neighbours_sql(table: str, column: str, key_column: str, storage: str = "full", dim: int = emb_size,
+                           extra_columns: str = "") -> str:
+    """
+    CTEs `query` (the query vector, sent once) and `nearest` (key, [extra columns,]
+    exact cosine distance) of the nearest rows, in an index-scan-friendly form:
+    ORDER BY distance LIMIT n, with no filter on the distance. Quantized storage orders
+    by the quantized distance first and re-scores the candidates exactly.
+    Parameters: the query vector, then the candidate count.
+    """
+    query_vector = "(SELECT embedding FROM query)"
+    extra = f", {extra_columns}" if extra_columns else ""
+    if storage == "full":
+        nearest = f"""
+        SELECT {key_column}{extra}, {column} <=> {query_vector} AS distance
+        FROM {table}
+        ORDER BY distance
+        LIMIT %s"""
+    else:
+        nearest = f"""
+        SELECT {key_column}{extra}, {column} <=> {query_vector} AS distance
+        FROM (
+            SELECT * FROM {table}
+            ORDER BY {first_pass_distance(column, storage, dim, query_vector)}
+            LIMIT %s
+        ) candidates"""
+    return f"""
+    query AS (SELECT %s::vector AS embedding),
+    nearest AS ({nearest}
+    )"""
+
+
+def widening_search(conn, run: Callable[[int], List[Dict[str, Any]]], table: str, column: str, storage: str, k: int,
+                    recall_target: float = RECALL_TARGET, max_rounds: int = SEARCH_MAX_WIDENING) -> List[Dict[str, Any]]:
+    """
+    Run a thresholded top-k search built on nearest_neighbours_sql, widening it when
+    too few results pass.
+
+    `run(candidates)` executes the search and returns rows carrying `candidate_count`
+    (rows `nearest` returned before the threshold). The candidate count doubles while
+    fewer than k rows pass and the index may have cut the candidates short (HNSW
+    returns at most ef_search rows) or a quantized first pass may have missed some.
+    """
+    candidates = rerank_candidates(storage, k)
+    previous = None
+    rows: List[Dict[str, Any]] = []
+    for _ in range(max_rounds + 1):
+        apply_search_settings(conn, table, column, candidates, recall_target)
+        rows = run(candidates)
+        returned = rows[0]["candidate_count"] if rows else 0
+        if len(rows) >= k or not rows or returned == previous:
+            break
+        if storage == "full" and returned >= candidates:
+            # These are the exact nearest rows: anything further is even less similar
+            break
+        previous = returned
+        candidates *= 2
+    return rows
+
+
+def rerank_candidates(storage: str, k: int) -> int:
+    """Number of first-pass candidates to fetch so that exact re-ranking recovers the top k."""
+    if storage == "halfvec":
+        return k * HALFVEC_RERANK_FACTOR
+    if storage == "binary":
+        return k * BINARY_RERANK_FACTOR
+    return k
+
+
+def index_ddl(name: str, table: str, column: str, method: str, rows: int, m: int = HNSW_M,
+              ef_construction: int = HNSW_EF_CONSTRUCTION, lists: Optional[int] = None, concurrently: bool = False,
+              storage: str = "full", dim: int = emb_size) -> str:
+    concurrently_sql = "CONCURRENTLY " if concurrently else ""
+    if method == "hnsw":
+        options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    elif method == "ivfflat":
+        options = f"lists = {int(lists or ivfflat_lists(rows))}"
+    else:
+        raise ValueError(f"Unknown vector index method: {method}")
+    expression, opclass = indexed_expression(column, storage, dim)
+    return f"""
+    CREATE INDEX {concurrently_sql}{name}
+    ON {table} USING {method} ({expression} {opclass}) WITH ({options})
+    """
+
+
+def _index_exists(cursor, name: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+    return cursor.fetchone()[0]
+
+
+def _index_size(cursor, name: str) -> Optional[int]:
+    cursor.execute("SELECT pg_relation_size(to_regclass(%s))", (name,))
+    return cursor.fetchone()[0]
+
+
+def build_vector_index(conn, name: str, table: str, column: str, method: str = VECTOR_INDEX_METHOD, m: int = HNSW_M,
+                       ef_construction: int = HNSW_EF_CONSTRUCTION, lists: Optional[int] = None,
+                       concurrently: bool = True, storage: str = VECTOR_STORAGE, dim: int = emb_size) -> Dict[str, Any]:
+    """
+    (Re)build one vector index and report its build time and size.
+
+    The new index is built under a temporary name (without blocking writes when
+    `concurrently`) and swapped in, so searches keep an index throughout.
+    """
+    conn.commit()
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} IS NOT NULL")
+        rows = cursor.fetchone()[0]
+        if INDEX_MAINTENANCE_WORK_MEM:
+            cursor.execute("SET maintenance_work_mem = %s", (INDEX_MAINTENANCE_WORK_MEM,))
+        # Leftover from an interrupted build
+        cursor.execute(f"DROP INDEX IF EXISTS {name}_new")
+
+        start = time.perf_counter()
+        cursor.execute(index_ddl(f"{name}_new", table, column, method, rows, m, ef_construction, lists, concurrently, storage, dim))
+        seconds = time.perf_counter() - start
+
+        cursor.execute("BEGIN")
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+        cursor.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+        cursor.execute("COMMIT")
+
+        report = {
+            "index": name,
+            "table": table,
+            "method": method,
+            "storage": storage,
+            "rows": rows,
+            "build_seconds": round(seconds, 2),
+            "size_bytes": _index_size(cursor, name),
+        }
+        if method == "hnsw":
+            report.update(m=m, ef_construction=ef_construction)
+        else:
+            report["lists"] = lists or ivfflat_lists(rows)
+    except Exception:
+        # Abort a half-done swap so the old index stays in place
+        if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        cursor.close()
+        conn.autocommit = autocommit
+
+    with _index_info_lock:
+        _index_info.pop((table, column), None)
+    logger.info(f"Built {method} ({storage}) index {name} over {rows} rows in {report['build_seconds']}s ({report['size_bytes']} bytes)")
+    return report
+
+
+def build_vector_indexes(conn=None, version: Optional[Dict[str, Any]] = None, method: str = VECTOR_INDEX_METHOD,
+                         m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION, lists: Optional[int] = None,
+                         concurrently: bool = True, only_missing: bool = False, storage: str = VECTOR_STORAGE) -> List[Dict[str, Any]]:
+    """
+    Build the vector indexes of an embedding version (default: the base columns) after
+    data load, when ivfflat centroids can be trained on real rows. With `only_missing`,
+    existing indexes are left alone.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = connect_to_db()
+    dim = emb_size if is_base_version(version) else version["dim"]
+    reports = []
+    try:
+        if dim > MAX_INDEXED_DIM[storage]:
+            logger.warning(f"{dim}-dimension vectors cannot be indexed as {storage}; searches will scan")
+            return reports
+        for name, table, column in index_targets(version):
+            if only_missing:
+                cursor = conn.cursor()
+                try:
+                    exists = _index_exists(cursor, name)
+                finally:
+                    cursor.close()
+                if exists:
+                    continue
+            reports.append(build_vector_index(conn, name, table, column, method, m, ef_construction, lists,
+                                              concurrently, storage, dim))
+    finally:
+        if own_conn:
+            conn.close()
+    return reports
+
+
+def ensure_vector_indexes(conn, version: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Build any vector index of the version that does not exist yet (e.g. after the first load)."""
+    return build_vector_indexes(conn, version, only_missing=True)
+
+
+def describe_index(conn, table: str, column: str) -> Optional[Dict[str, Any]]:
+    """Return the method, storage type and build options of the vector index on table.column, cached briefly."""
+    key = (table, column)
+    with _index_info_lock:
+        cached = _index_info.get(key)
+        if cached is not None and time.monotonic() - cached[0] < INDEX_INFO_TTL:
+            return cached[1]
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        SELECT am.amname, c.reloptions, pg_relation_size(c.oid), pg_get_indexdef(c.oid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_am am ON am.oid = c.relam
+        WHERE i.indrelid = to_regclass(%s) AND i.indisvalid AND am.amname IN ('hnsw', 'ivfflat')
+        """, (table,))
+        # Quantized indexes are on expressions, so match the column in the definition
+        row = next((r for r in cursor.fetchall() if re.search(rf"\b{column}\b", r[3])), None)
+    finally:
+        cursor.close()
+
+    info = None
+    if row is not None:
+        options = dict(option.split("=", 1) for option in (row[1] or []))
+        storage = "binary" if "bit_hamming_ops" in row[3] else "halfvec" if "halfvec_cosine_ops" in row[3] else "full"
+        info = {"method": row[0], "storage": storage, "options": options, "size_bytes": row[2]}
+        if row[0] == "ivfflat":
+            info["lists"] = int(options.get("lists", 100))
+    with _index_info_lock:
+        _index_info[key] = (time.monotonic(), info)
+    return info
+
+
+def search_settings(index: Optional[Dict[str, Any]], k: int, recall_target: float = RECALL_TARGET) -> Optional[Tuple[str, int]]:
+    """Return the (setting, value) that should reach `recall_target` for a top-k search on the index."""
+    if index is None:
+        return None
+    _, fraction, ef_search = next((row for row in RECALL_SETTINGS if recall_target <= row[0]), RECALL_SETTINGS[-1])
+    if index["method"] == "hnsw":
+        # ef_search bounds the candidate list, so it must cover k
+        return "hnsw.ef_search", max(ef_search, k)
+    return "ivfflat.probes", max(1, min(index["lists"], math.ceil(index["lists"] * fraction)))
+
+
+def apply_search_settings(conn, table: str, column: str, k: int, recall_target: float = RECALL_TARGET) -> Optional[Tuple[str, int]]:
+    """SET LOCAL the search parameter of the index on table.column for the current transaction."""
+    setting = search_settings(describe_index(conn, table, column), k, recall_target)
+    if setting is not None:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SET LOCAL {setting[0]} = {int(setting[1])}")
+        finally:
+            cursor.close()
+    return setting
+
+
+def index_report(conn, version: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Describe the vector indexes of an embedding version."""
+    report = []
+    for name, table, column in index_targets(version):
+        with _index_info_lock:
+            _index_info.pop((table, column), None)
+        info = describe_index(conn, table, column)
+        report.append({"index": name, "table": table, **(info or {"method": None})})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the vector (ANN) indexes after loading data.")
+    parser.add_argument("--method", choices=["hnsw", "ivfflat"], default=VECTOR_INDEX_METHOD)
+    parser.add_argument("--m", type=int, default=HNSW_M, help="HNSW: neighbours per node")
+    parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION, help="HNSW: build candidate list size")
+    parser.add_argument("--storage", choices=["full", "halfvec", "binary"], default=VECTOR_STORAGE,
+                        help="Index full-precision, half-precision or binary-quantized vectors")
+    parser.add_argument("--lists", type=int, default=None, help="IVFFlat: number of lists (default from row count)")
+    parser.add_argument("--version", type=int, default=None, help="Embedding version (default: the active one)")
+    parser.add_argument("--no-concurrently", action="store_true", help="Build with a write lock (faster)")
+    parser.add_argument("--report", action="store_true", help="Only describe the existing indexes")
+    parser.add_argument("--recall-target", type=float, default=RECALL_TARGET,
+                        help="Show the per-query search setting chosen for this recall target")
+    args = parser.parse_args()
+
+    conn = connect_to_db()
+    try:
+        version = get_version(conn, args.version) if args.version is not None else get_active_version(conn)
+        if not args.report:
+            reports = build_vector_indexes(conn, version, args.method, args.m, args.ef_construction, args.lists,
+                                           concurrently=not args.no_concurrently, storage=args.storage)
+            logger.info(json.dumps(reports, indent=2))
+        for entry in index_report(conn, version):
+            entry["search_setting"] = search_settings(entry if entry["method"] else None, 5, args.recall_target)
+            logger.info(json.dumps(entry, default=str))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()